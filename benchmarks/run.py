@@ -0,0 +1,248 @@
+# benchmarks/run.py
+"""Benchmarks for the data layer, the report engine and the renderers.
+
+Creates a throwaway database (next to POSTGRES_DB, or a temporary
+SQLITE_PATH with DB_BACKEND=sqlite), seeds background users plus one
+measured user per data size, times every case and compares the
+medians with a stored baseline. Exits with status 1 when a case is slower
+than the baseline by more than the tolerance, and with status 2 when
+there is no baseline to compare with.
+
+Usage:
+    python benchmarks/run.py [--sizes 100,1000,10000] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import database.handlers as handlers  # noqa: E402
+import seed as seeding  # noqa: E402
+from database.migrations import migrate  # noqa: E402
+from grouping import extract_group  # noqa: E402
+from reports.text import iter_user_report  # noqa: E402
+from view import render  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_DATABASE = "progress_track_bench"
+
+
+def admin_connection():
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        database=os.getenv("POSTGRES_DB", "postgres"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+    )
+    conn.autocommit = True
+    return conn
+
+
+def using_sqlite():
+    # Decided before get_backend(), which reads SQLITE_PATH once
+    return os.getenv("DB_BACKEND", "postgres").lower() == "sqlite"
+
+
+def backend_name():
+    return "sqlite" if using_sqlite() else "postgres"
+
+
+def create_database(name):
+    """(Re)create the benchmark database and point the handlers at it."""
+    if using_sqlite():
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix=f"{name}-"), "bench.db")
+    else:
+        if name == os.getenv("POSTGRES_DB", "postgres"):
+            raise SystemExit(f"Refusing to use POSTGRES_DB ({name}) as the benchmark database")
+        conn = admin_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+        finally:
+            conn.close()
+        # handlers read the connection settings when the pool is first created
+        os.environ["POSTGRES_DB"] = name
+    conn = handlers.get_database_connection()
+    try:
+        migrate(conn, log=lambda message: None)
+    finally:
+        conn.close()
+
+
+def drop_database(name, admin_db):
+    handlers.get_pool().closeall()
+    if using_sqlite():
+        shutil.rmtree(os.path.dirname(os.environ["SQLITE_PATH"]), ignore_errors=True)
+        return
+    os.environ["POSTGRES_DB"] = admin_db
+    conn = admin_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    finally:
+        conn.close()
+
+
+def measure(func, repeat):
+    """Return (median seconds, peak traced bytes) over repeat calls after a warm-up."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    # Memory is traced in a separate call: tracemalloc slows everything down
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def build_cases(user_id, size, groups):
+    """Return {case: (func, items processed per call)} for one data size."""
+    group_names = seeding.make_groups(groups)
+    rows = seeding.make_rows(size, group_names, seed=size)
+    descriptions = [description for description, _, _ in rows]
+    points = [value for _, value, _ in rows]
+    journey = seeding.make_journey(size, group_names, seed=size)
+
+    def extract_groups():
+        extract_group.cache_clear()
+        for description in descriptions:
+            extract_group(description)
+
+    def render_flags():
+        for value in points:
+            render.render_flag(value, "#4CAF50")
+
+    def daily_journey():
+        # Measure the layout itself, not a cache hit
+        render._journey_cache.clear()
+        render.create_daily_journey_html(journey)
+
+    return {
+        "get_achievements": (lambda: handlers.get_achievements(user_id), size),
+        "get_user_level_info": (lambda: handlers.get_user_level_info(user_id), 1),
+        # Same as main.generate_report_text, which lives in the Streamlit script
+        "generate_report_text": (lambda: "".join(iter_user_report(user_id)), size),
+        "extract_group": (extract_groups, size),
+        "render_flag": (render_flags, size),
+        "create_daily_journey_html": (daily_journey, size),
+    }
+
+
+def run(sizes, users, per_user, groups, repeat):
+    seeding.seed_users(users, per_user, groups)
+    results = {}
+    for size in sizes:
+        user_id = seeding.seed_user(f"bench_size_{size}", size,
+                                    seeding.make_groups(groups), seed=size)
+        handlers.recompute_user_stats(user_id)
+        for case, (func, items) in build_cases(user_id, size, groups).items():
+            seconds, peak = measure(func, repeat)
+            results.setdefault(case, {})[str(size)] = {
+                "seconds": seconds,
+                "items_per_second": items / seconds if seconds else None,
+                "peak_kib": peak / 1024,
+            }
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print a table of results and return the regressed (case, size) pairs."""
+    regressions = []
+    print(f"{'case':28} {'size':>7} {'median ms':>10} {'items/s':>12} {'peak KiB':>10}  baseline")
+    for case, by_size in results.items():
+        for size, result in by_size.items():
+            seconds = result["seconds"]
+            note = ""
+            base = baseline.get(case, {}).get(size)
+            if base is not None:
+                ratio = seconds / base["seconds"] if base["seconds"] else float("inf")
+                note = f"{ratio:.2f}x"
+                if ratio > 1 + tolerance and seconds - base["seconds"] > min_delta:
+                    note += "  REGRESSION"
+                    regressions.append((case, size))
+            rate = result["items_per_second"]
+            print(f"{case:28} {size:>7} {seconds * 1000:>10.2f} "
+                  f"{rate if rate is not None else float('nan'):>12.0f} "
+                  f"{result['peak_kib']:>10.1f}  {note}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python benchmarks/run.py")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="Comma-separated achievement counts of the measured user")
+    parser.add_argument("--users", type=int, default=50, help="Background users to seed")
+    parser.add_argument("--per-user", type=int, default=200,
+                        help="Achievements per background user")
+    parser.add_argument("--groups", type=int, default=8, help="Distinct groups")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per case")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write the results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this, as timer noise")
+    parser.add_argument("--database", default=DEFAULT_DATABASE,
+                        help=f"Throwaway database to create (default: {DEFAULT_DATABASE})")
+    parser.add_argument("--keep-db", action="store_true", help="Keep the seeded database")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    admin_db = os.getenv("POSTGRES_DB", "postgres")
+    create_database(args.database)
+    try:
+        results = run(sizes, args.users, args.per_user, args.groups, args.repeat)
+    finally:
+        if not args.keep_db:
+            drop_database(args.database, admin_db)
+        elif using_sqlite():
+            print(f"Seeded database kept at {os.environ['SQLITE_PATH']}")
+
+    if args.save_baseline:
+        compare(results, {}, args.tolerance, 0)
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "backend": backend_name(),
+            "results": results,
+        }, indent=2))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        compare(results, {}, args.tolerance, 0)
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 2
+    saved = json.loads(args.baseline.read_text())
+    if saved.get("backend", "postgres") != backend_name():
+        print(f"Baseline was recorded on {saved.get('backend', 'postgres')}, this run uses "
+              f"{backend_name()}; set DB_BACKEND to match or refresh the baseline")
+    regressions = compare(results, saved["results"], args.tolerance, args.min_delta_ms / 1000)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.tolerance:.0%} tolerance")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
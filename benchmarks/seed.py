@@ -0,0 +1,89 @@
+# benchmarks/seed.py
+"""Synthetic users and achievements for the benchmarks.
+
+Data is generated from a seeded RNG, so every run measures the same
+descriptions, points and timestamps.
+"""
+import random
+from datetime import datetime, timedelta
+
+import database.handlers as handlers
+from database.backends import get_backend
+from grouping import extract_group
+from view.style_and_content_consts import GROUP_COLORS
+
+WORDS = (
+    "сделала прочитал закончил новый проект статья код ревью тесты отчёт "
+    "созвон презентация спорт бег зал книга глава курс урок задача баг "
+    "релиз дизайн идея план встреча письмо документация python sql "
+    "streamlit docker deploy refactor benchmark"
+).split()
+# Share of descriptions written as 'GROUP: text'
+TAGGED_SHARE = 0.8
+
+
+def make_groups(count):
+    return [f"ПРОЕКТ{i}" for i in range(1, count + 1)]
+
+
+def make_description(rng, groups):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+    if groups and rng.random() < TAGGED_SHARE:
+        return f"{rng.choice(groups)}: {text}"
+    return text
+
+
+def make_rows(count, groups, seed=0, days=365, now=None):
+    """Return count (description, points, created_at) tuples, oldest first."""
+    rng = random.Random(seed)
+    now = now or datetime(2024, 1, 1)
+    start = now - timedelta(days=days)
+    timestamps = sorted(start + timedelta(seconds=rng.randrange(days * 86400))
+                        for _ in range(count))
+    return [(make_description(rng, groups), rng.randint(5, 50), created_at)
+            for created_at in timestamps]
+
+
+def make_journey(count, groups, seed=0):
+    """Return Daily Journey input for count achievements of a single day."""
+    rng = random.Random(seed)
+    colors = {group: GROUP_COLORS[i % len(GROUP_COLORS)] for i, group in enumerate(groups)}
+    minutes = sorted(rng.randrange(24 * 60) for _ in range(count))
+    journey = []
+    for minute in minutes:
+        description = make_description(rng, groups)
+        journey.append({
+            "description": description,
+            "points": rng.randint(5, 50),
+            "created_at": f"{minute // 60:02d}:{minute % 60:02d}",
+            "color": colors.get(extract_group(description)[0], "#4CAF50"),
+        })
+    return journey
+
+
+def seed_user(username, count, groups, seed=0):
+    """Insert a user with count achievements and return the user id."""
+    rows = make_rows(count, groups, seed)
+    with handlers.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (username, password_hash) VALUES (%s, %s) RETURNING id",
+                (username, handlers.hash_password(username))
+            )
+            user_id = cur.fetchone()[0]
+            get_backend().execute_values(cur, """
+                INSERT INTO achievements (description, points, user_id, category, created_at)
+                VALUES %s
+            """, [(description, points, user_id, extract_group(description)[0], created_at)
+                  for description, points, created_at in rows],
+                page_size=handlers.BULK_PAGE_SIZE)
+    return user_id
+
+
+def seed_users(users, achievements_per_user, groups, seed=0):
+    """Seed users × achievements × groups and return the user ids."""
+    group_names = make_groups(groups)
+    user_ids = [seed_user(f"bench_{seed}_{i}", achievements_per_user, group_names, seed + i)
+                for i in range(users)]
+    handlers.recompute_user_stats()
+    return user_ids
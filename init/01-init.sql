@@ -1,8 +1,11 @@
+-- Reference schema. The source of truth is src/database/migrations.py,
+-- applied by `python -m database.init_db`; keep this file in sync with it.
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     username VARCHAR(50) UNIQUE NOT NULL,
     password_hash VARCHAR(64) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    session_epoch INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE IF NOT EXISTS achievements (
@@ -10,5 +13,75 @@ CREATE TABLE IF NOT EXISTS achievements (
     description TEXT NOT NULL,
     points INTEGER NOT NULL,
     user_id INTEGER REFERENCES users(id),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    category TEXT NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('russian', description) || to_tsvector('english', description)
+    ) STORED
 );
+
+CREATE INDEX IF NOT EXISTS achievements_user_created_idx
+    ON achievements (user_id, created_at);
+CREATE INDEX IF NOT EXISTS achievements_user_category_created_idx
+    ON achievements (user_id, category, created_at);
+CREATE INDEX IF NOT EXISTS achievements_search_idx
+    ON achievements USING GIN (search_vector);
+
+CREATE TABLE IF NOT EXISTS group_colors (
+    user_id INTEGER,
+    group_name TEXT,
+    color TEXT,
+    PRIMARY KEY (user_id, group_name),
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    total_points INTEGER NOT NULL DEFAULT 0,
+    achievement_count INTEGER NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    job_name TEXT PRIMARY KEY,
+    last_slot TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS leaderboard_scores (
+    period TEXT NOT NULL,
+    bucket DATE NOT NULL,
+    category TEXT NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    points INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, category, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS leaderboard_scores_rank_idx
+    ON leaderboard_scores (period, bucket, category, points DESC, user_id);
+CREATE INDEX IF NOT EXISTS leaderboard_scores_user_idx
+    ON leaderboard_scores (user_id);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    category TEXT NOT NULL,
+    bucket DATE NOT NULL,
+    points INTEGER NOT NULL,
+    achievement_count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, category, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS daily_rollups_user_bucket_idx
+    ON daily_rollups (user_id, bucket);
+
+CREATE TABLE IF NOT EXISTS weekly_rollups (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    category TEXT NOT NULL,
+    bucket DATE NOT NULL,
+    points INTEGER NOT NULL,
+    achievement_count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, category, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS weekly_rollups_user_bucket_idx
+    ON weekly_rollups (user_id, bucket);
@@ -0,0 +1,98 @@
+# scripts/check_import_budget.py
+"""Fail when importing the app's modules gets slow or starts doing work.
+
+Each module is imported in a fresh interpreter with `python -X importtime`
+and checked against a cumulative time budget and a list of modules it must
+not pull in. POSTGRES_HOST points at a missing socket, so a module that
+opens a database connection at import time fails the check as well.
+
+Usage:
+    python scripts/check_import_budget.py [--scale 2.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# module -> (budget in milliseconds, modules it must not import)
+BUDGETS = {
+    "consts": (100, ("streamlit", "psycopg2")),
+    "grouping": (50, ("streamlit", "psycopg2")),
+    "models": (50, ("streamlit", "psycopg2")),
+    "database.handlers": (150, ("streamlit",)),
+    "database.migrations": (150, ("streamlit",)),
+    "database.snapshot": (150, ("streamlit",)),
+    "auth": (150, ("streamlit",)),
+    "jobs.tasks": (150, ("streamlit", "reports.export")),
+    "reports.text": (150, ("streamlit",)),
+    "view.utils": (100, ("streamlit",)),
+    "view.render": (600, ("streamlit_extras",)),
+    "view.achievement_list": (600, ("streamlit_extras",)),
+    "view.animations": (600, ("streamlit_extras",)),
+    "view.charts": (100, ("streamlit", "altair")),
+}
+
+
+def measure(module):
+    """Return (cumulative microseconds, imported module names) for a fresh import."""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR),
+               POSTGRES_HOST="/nonexistent", PGCONNECT_TIMEOUT="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_text, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if cumulative_text.strip().isdigit():
+            imported.add(name)
+            if name == module:
+                cumulative = int(cumulative_text)
+    return cumulative, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python scripts/check_import_budget.py")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every time budget, e.g. on slow CI machines")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        try:
+            cumulative, imported = measure(module)
+        except RuntimeError as e:
+            print(f"FAIL {module}: import failed: {e}")
+            failures += 1
+            continue
+
+        elapsed_ms = cumulative / 1000
+        limit_ms = budget_ms * args.scale
+        problems = []
+        if elapsed_ms > limit_ms:
+            problems.append(f"{elapsed_ms:.0f} ms > {limit_ms:.0f} ms")
+        pulled_in = sorted(name for name in forbidden if name in imported)
+        if pulled_in:
+            problems.append("imports " + ", ".join(pulled_in))
+
+        status = "FAIL" if problems else "ok"
+        details = "; ".join(problems) or f"{elapsed_ms:.0f} ms"
+        print(f"{status:4} {module}: {details}")
+        failures += bool(problems)
+
+    if failures:
+        print(f"{failures} module(s) over budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Signed session tokens and per-user bootstrap cache.
+
+A token is `<user_id>.<epoch>.<expires>.<signature>` where the signature
+is an HMAC-SHA256 over the first three fields. The epoch must match the
+user's `session_epoch`, which logging out increments, so every token
+issued before is revoked. Checking the signature needs no database, but
+the epoch is read from the primary through the bootstrap cache: at most
+one query per user per BOOTSTRAP_TTL_SECONDS in each process, and a
+logout takes up to that long to reach other processes. That is the price
+of revocation; reconnect storms still cost one query per user, not one
+per reload.
+The token travels in the page URL (`?session=...`), which is the only
+client-side state Streamlit exposes.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import database.handlers as handlers
+from consts import SESSION_SECRET, SESSION_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+if not SESSION_SECRET:
+    logger.error("SESSION_SECRET is not set: session tokens will not survive a restart "
+                 "and will not be accepted by other instances")
+_secret = (SESSION_SECRET or secrets.token_hex(32)).encode()
+
+BOOTSTRAP_CACHE_SIZE = 1024
+BOOTSTRAP_TTL_SECONDS = 60
+
+
+def _sign(payload):
+    digest = hmac.new(_secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue_session_token(user_id, ttl=SESSION_TTL_SECONDS):
+    """Return a signed token identifying user_id until now + ttl seconds or logout."""
+    epoch = get_bootstrap(user_id)['session_epoch']
+    payload = f"{user_id}.{epoch}.{int(time.time()) + ttl}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_session_token(token):
+    """Return the user id carried by a valid, unexpired, unrevoked token, else None."""
+    try:
+        user_id, epoch, expires, signature = token.split(".")
+        payload = f"{user_id}.{epoch}.{expires}"
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        if int(expires) < time.time():
+            return None
+        user_id = int(user_id)
+    except (AttributeError, ValueError):
+        return None
+    if get_bootstrap(user_id)['session_epoch'] != int(epoch):
+        return None
+    return user_id
+
+
+def revoke_sessions(user_id):
+    """Log the user out everywhere: tokens issued so far stop verifying."""
+    handlers.revoke_sessions(user_id)
+    invalidate_bootstrap(user_id)
+
+
+class BootstrapCache:
+    """Small thread-safe LRU of per-user data needed to resume a session."""
+
+    def __init__(self, loader, maxsize=BOOTSTRAP_CACHE_SIZE, ttl=BOOTSTRAP_TTL_SECONDS):
+        self._loader = loader
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] < self._ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        data = self._loader(user_id)
+        with self._lock:
+            self._entries[user_id] = (now, data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def _load_bootstrap(user_id):
+    return {'session_epoch': handlers.get_session_epoch(user_id),
+            'group_colors': handlers.get_group_colors(user_id)}
+
+
+_bootstrap_cache = BootstrapCache(_load_bootstrap)
+
+
+def get_bootstrap(user_id):
+    """Per-user data loaded on login or resume; callers must copy before mutating."""
+    return _bootstrap_cache.get(user_id)
+
+
+def invalidate_bootstrap(user_id):
+    _bootstrap_cache.invalidate(user_id)
@@ -10,3 +10,14 @@ load_dotenv(ENV_PATH)
 
 # Get QUOTES_FILE with fallback to default value
 QUOTES_FILE = os.getenv('QUOTES_FILE', 'quotes.txt')
+
+# Where nightly report exports are written
+REPORTS_DIR = os.getenv('REPORTS_DIR', '/app/reports')
+
+# Timezone the UI shows days in, and the one naive DB timestamps are stored in
+APP_TIMEZONE = os.getenv('APP_TIMEZONE', 'Europe/Moscow')
+DB_TIMEZONE = os.getenv('DB_TIMEZONE', 'UTC')
+
+# Secret for signing session tokens; set it so sessions survive restarts
+SESSION_SECRET = os.getenv('SESSION_SECRET')
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
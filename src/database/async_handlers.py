@@ -0,0 +1,196 @@
+# src/database/async_handlers.py
+"""asyncio counterparts of database.handlers for background work.
+
+Uses asyncpg with its own pool (one per event loop), so jobs can overlap
+many per-user queries without a thread per query. Function names and
+return shapes mirror the synchronous handlers, writes keep the derived
+tables in step through the same database.derived statements and pin the
+writer's reads to the primary. PostgreSQL only.
+"""
+import asyncio
+import os
+import re
+import weakref
+from functools import lru_cache
+
+import asyncpg
+
+from consts import APP_TIMEZONE, DB_TIMEZONE
+from database import derived
+from database.handlers import level_info_from_points, local_day_bounds
+from database.routing import get_router
+from grouping import extract_group
+from models import Achievement
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+_pools = weakref.WeakKeyDictionary()
+
+
+async def get_pool():
+    """Return the asyncpg pool for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = await asyncpg.create_pool(
+            host=os.getenv("POSTGRES_HOST", "postgres"),
+            database=os.getenv("POSTGRES_DB", "postgres"),
+            user=os.getenv("POSTGRES_USER", "postgres"),
+            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+            min_size=int(os.getenv("POSTGRES_ASYNC_POOL_MIN", "1")),
+            max_size=int(os.getenv("POSTGRES_ASYNC_POOL_MAX", "20")),
+            timeout=float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),
+        )
+        _pools[loop] = pool
+    return pool
+
+
+async def close_pool():
+    """Close the pool of the running event loop."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+async def gather_bounded(func, items, limit=20):
+    """Await func(item) for every item with at most `limit` calls in flight.
+
+    Results are returned in the order of `items`.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def map_users(func, limit=20):
+    """Call func(user_id, username) for every user with bounded concurrency.
+
+    Returns a dict of user_id -> result.
+    """
+    users = await get_all_users()
+    results = await gather_bounded(lambda user: func(*user), users, limit)
+    return {user_id: result for (user_id, _), result in zip(users, results)}
+
+
+async def get_all_users():
+    """Return list of tuples (user_id, username) for all users"""
+    pool = await get_pool()
+    rows = await pool.fetch("SELECT id, username FROM users")
+    return [tuple(row) for row in rows]
+
+
+async def get_achievements(user_id):
+    """Get all achievements for a specific user."""
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        SELECT id, description, points, created_at
+        FROM achievements
+        WHERE user_id = $1
+        ORDER BY created_at ASC
+    """, user_id)
+    return [Achievement.from_row(tuple(row)) for row in rows]
+
+
+async def get_achievements_between(user_id, start_date, end_date, tz=None):
+    """Get a user's achievements whose local day falls in [start_date, end_date].
+
+    A None date leaves that end of the range open.
+    """
+    tz = tz or APP_TIMEZONE
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        SELECT id, description, points, created_at,
+               (created_at AT TIME ZONE $1 AT TIME ZONE $2)::date AS local_day
+        FROM achievements
+        WHERE user_id = $3
+        AND ($4::timestamp IS NULL OR created_at >= $4)
+        AND ($5::timestamp IS NULL OR created_at < $5)
+        ORDER BY created_at ASC
+    """, DB_TIMEZONE, tz, user_id, lower, upper)
+    return [Achievement.from_row(tuple(row)) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def _numbered(query, row_width=None):
+    """Rewrite %s placeholders as $1..$n; row_width expands `VALUES %s` to one row."""
+    if row_width is not None:
+        query = query.replace("%s", "(" + ", ".join(["%s"] * row_width) + ")", 1)
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", query)
+
+
+async def _execute(conn, statements):
+    """asyncpg version of derived.execute."""
+    for statement in statements:
+        if statement.values is None:
+            await conn.execute(_numbered(statement.query), *statement.params)
+        elif statement.values:
+            await conn.executemany(
+                _numbered(statement.query, len(statement.values[0])), statement.values)
+
+
+def _note_write(user_id):
+    router = get_router()
+    if router is not None:
+        router.note_write(user_id)
+
+
+async def add_achievement(description, points, user_id):
+    """Add an achievement to the database."""
+    _note_write(user_id)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow("""
+                INSERT INTO achievements (description, points, user_id, category)
+                VALUES ($1, $2, $3, $4)
+                RETURNING points, created_at, category
+            """, description, points, user_id, extract_group(description)[0])
+            await _execute(conn, derived.added(user_id, [tuple(row)]))
+
+
+async def delete_achievement(achievement_id, user_id):
+    """Delete a specific achievement by its ID and user_id."""
+    _note_write(user_id)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            rows = await conn.fetch("""
+                DELETE FROM achievements WHERE id = $1 AND user_id = $2
+                RETURNING points, created_at, category
+            """, achievement_id, user_id)
+            await _execute(conn, derived.removed(user_id, [tuple(row) for row in rows]))
+
+
+async def get_user_points(user_id):
+    pool = await get_pool()
+    total_points = await pool.fetchval(
+        "SELECT total_points FROM user_stats WHERE user_id = $1", user_id)
+    return total_points or 0
+
+
+async def get_user_level_info(user_id):
+    return level_info_from_points(await get_user_points(user_id))
+
+
+async def save_group_color(user_id, group_name, color):
+    _note_write(user_id)
+    pool = await get_pool()
+    await pool.execute("""
+        INSERT INTO group_colors (user_id, group_name, color)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (user_id, group_name)
+        DO UPDATE SET color = EXCLUDED.color
+    """, user_id, group_name, color)
+
+
+async def get_group_colors(user_id):
+    pool = await get_pool()
+    rows = await pool.fetch(
+        "SELECT group_name, color FROM group_colors WHERE user_id = $1", user_id)
+    return {row[0]: row[1] for row in rows}
@@ -0,0 +1,483 @@
+# src/database/backends.py
+"""Storage backends behind database.handlers.
+
+DB_BACKEND selects PostgreSQL (default) or an embedded SQLite file at
+SQLITE_PATH. Handlers keep writing PostgreSQL-flavoured SQL with `%s`
+placeholders; the SQLite backend wraps its connections so that SQL is
+translated on the fly, and both backends expose the few operations whose
+SQL genuinely differs (bulk VALUES inserts, local-day bucketing, locks).
+"""
+import csv
+import fcntl
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from database import metrics
+from database.pool import ConnectionPool
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class CsvRowReader(io.TextIOBase):
+    """Text stream rendering row tuples as CSV lines on demand, for COPY FROM STDIN.
+
+    None becomes an unquoted empty field, which COPY reads as NULL.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunks, length = [self._pending], len(self._pending)
+        for row in self._rows:
+            self._writer.writerow(row)
+            chunk = self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            chunks.append(chunk)
+            length += len(chunk)
+            if 0 <= size <= length:
+                break
+        data = "".join(chunks)
+        if size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+class _CopyTextUnescaper(io.TextIOBase):
+    """Undo COPY's text-format escaping of single-column JSON rows.
+
+    JSON has no raw control characters, so the only escape left in a row
+    is the doubled backslash. psycopg2 writes whole rows, so a pair is
+    never split across writes.
+    """
+
+    def __init__(self, out):
+        self._out = out
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._out.write(data.replace("\\\\", "\\"))
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class PostgresBackend:
+    name = "postgres"
+    # Errors after which a connection is discarded instead of reused
+    disconnect_errors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    @property
+    def location(self):
+        return f"{os.getenv('POSTGRES_HOST', 'postgres')}/{os.getenv('POSTGRES_DB', 'postgres')}"
+
+    def connect(self, dsn=None):
+        """Connect to POSTGRES_* settings, or to dsn (e.g. a replica) if given."""
+        if dsn is not None:
+            return psycopg2.connect(dsn, cursor_factory=metrics.InstrumentedCursor)
+        return psycopg2.connect(
+            host=os.getenv("POSTGRES_HOST", "postgres"),
+            database=os.getenv("POSTGRES_DB", "postgres"),
+            user=os.getenv("POSTGRES_USER", "postgres"),
+            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+            cursor_factory=metrics.InstrumentedCursor,
+        )
+
+    def create_pool(self, dsn=None):
+        return ConnectionPool(
+            lambda: self.connect(dsn),
+            minconn=int(os.getenv("POSTGRES_POOL_MIN", "1")),
+            maxconn=int(os.getenv("POSTGRES_POOL_MAX", "10")),
+            timeout=float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),
+            max_waiters=int(os.getenv("POSTGRES_POOL_MAX_WAITERS", "50")),
+            check_after=float(os.getenv("POSTGRES_POOL_CHECK_AFTER", "30")),
+            max_lifetime=float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", "3600")),
+        )
+
+    def execute_values(self, cur, query, rows, page_size=100, fetch=False):
+        """Run `query` (with one `VALUES %s`) for rows in multi-row pages."""
+        return execute_values(cur, query, rows, page_size=page_size, fetch=fetch)
+
+    def local_day(self, column, alias):
+        """SELECT expression bucketing a DB timestamp into a local date.
+
+        Takes two parameters: the DB time zone and the local time zone.
+        """
+        return f"({column} AT TIME ZONE %s AT TIME ZONE %s)::date AS {alias}"
+
+    def text_search(self, text, where):
+        """SELECT of achievements `a` matching text and the `where` condition.
+
+        Returns (query, params): params go before those of `where`, and the
+        query ends with LIMIT %s OFFSET %s. Rows are (id, description,
+        points, created_at), best match first. Matching uses the GIN-indexed
+        search_vector (Russian and English stems).
+        """
+        return f"""
+            SELECT a.id, a.description, a.points, a.created_at
+            FROM achievements a,
+                 (SELECT websearch_to_tsquery('russian', %s)
+                         || websearch_to_tsquery('english', %s) AS query) q
+            WHERE a.search_vector @@ q.query AND {where}
+            ORDER BY ts_rank(a.search_vector, q.query) DESC, a.created_at DESC
+            LIMIT %s OFFSET %s
+        """, [text, text]
+
+    def copy_rows(self, cur, table, columns, rows):
+        """Bulk-load an iterable of row tuples into table, streaming them via COPY."""
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                        CsvRowReader(rows), size=COPY_BUFFER_SIZE)
+
+    def copy_query(self, cur, query, params, out, fmt="csv"):
+        """Stream the rows of a SELECT into the text file out via COPY TO STDOUT.
+
+        fmt is 'csv' (with a header line) or 'jsonl' (one object per row,
+        keyed by column name).
+        """
+        query = cur.mogrify(query, params).decode()
+        if fmt == "csv":
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+        else:
+            cur.copy_expert(f"COPY (SELECT row_to_json(t) FROM ({query}) t) TO STDOUT",
+                            _CopyTextUnescaper(out))
+
+    def lock_table(self, cur, table):
+        """Block writes to table until the end of the transaction."""
+        # Unlike SHARE, this mode conflicts with itself, so two lockers that
+        # go on to write queue up instead of deadlocking
+        cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+
+    def advisory_lock(self, cur, key):
+        cur.execute("SELECT pg_advisory_lock(%s)", (key,))
+
+    def try_advisory_lock(self, cur, key):
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (key,))
+        return cur.fetchone()[0]
+
+    def advisory_unlock(self, cur, key):
+        cur.execute("SELECT pg_advisory_unlock(%s)", (key,))
+
+
+_PARAM_RE = re.compile(r"%([s%])")
+_CAST_RE = re.compile(r"::\w+")
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=512)
+def translate_sql(query):
+    """Rewrite the PostgreSQL-flavoured SQL used by the handlers for SQLite."""
+    query = _PARAM_RE.sub(lambda m: "?" if m.group(1) == "s" else "%", query)
+    query = _CAST_RE.sub("", query)
+    return (query
+            .replace('COLLATE "C"', "COLLATE BINARY")
+            .replace("GREATEST(", "MAX(")
+            .replace("IS DISTINCT FROM", "IS NOT"))
+
+
+def _local_date(created_at, db_tz, tz):
+    if created_at is None:
+        return None
+    moment = datetime.fromisoformat(created_at).replace(tzinfo=ZoneInfo(db_tz))
+    return moment.astimezone(ZoneInfo(tz)).date().isoformat()
+
+
+class SQLiteCursor:
+    """DB-API cursor over sqlite3 that accepts the handlers' SQL."""
+
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self._cursor = cursor
+        # Set by callers expecting a server-side cursor; SQLite already
+        # steps through results lazily, so it needs no batching.
+        self.itersize = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=None):
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(translate_sql(query), params or ())
+        finally:
+            metrics.record_query(query, params, time.perf_counter() - started,
+                                 max(self._cursor.rowcount, 0))
+        return None
+
+    def executemany(self, query, params_list):
+        self._cursor.executemany(translate_sql(query), params_list)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with psycopg2-style cursors (context managers, names)."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.closed = False
+
+    def cursor(self, name=None):
+        # Named (server-side) cursors fall back to plain ones
+        return SQLiteCursor(self, self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+        self.closed = True
+
+
+class SQLitePool:
+    """Keeps up to `maxidle` SQLite connections for reuse; never blocks."""
+
+    def __init__(self, connect, maxidle=5):
+        self._connect = connect
+        self.maxidle = maxidle
+        self._idle = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+        try:
+            return self._connect()
+        except BaseException:
+            with self._lock:
+                self._size -= 1
+            raise
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed and conn.raw.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if discard or conn.closed or len(self._idle) >= self.maxidle:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+                return
+        if not conn.closed:
+            conn.close()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': 0,
+                'maxconn': self.maxidle,
+            }
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    # A file has no connection to lose; OperationalError ("database is
+    # locked", syntax errors, missing tables) must reach the caller as is
+    disconnect_errors = (sqlite3.InterfaceError,)
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("SQLITE_PATH", "/app/data/progress.db")
+        self.busy_timeout = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+        # Timestamps are stored as text in the format of the column defaults,
+        # millisecond precision included, so they compare correctly as text.
+        sqlite3.register_adapter(
+            datetime, lambda value: value.isoformat(" ", timespec="milliseconds"))
+        sqlite3.register_adapter(date, lambda value: value.isoformat())
+        sqlite3.register_converter(
+            "TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+        sqlite3.register_converter(
+            "TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+        sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+        # Advisory locks are flock()ed files next to the database: key -> open file
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def location(self):
+        return self.path
+
+    def connect(self):
+        raw = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            # Take the write lock when a write transaction starts, so two
+            # writers never deadlock upgrading from a read lock.
+            isolation_level="IMMEDIATE",
+            check_same_thread=False,
+        )
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        raw.create_function("local_date", 3, _local_date, deterministic=True)
+        return SQLiteConnection(raw)
+
+    def create_pool(self):
+        return SQLitePool(self.connect, maxidle=int(os.getenv("SQLITE_POOL_MAX_IDLE", "5")))
+
+    def execute_values(self, cur, query, rows, page_size=100, fetch=False):
+        """Expand `VALUES %s` into a multi-row VALUES list page by page."""
+        rows = list(rows)
+        results = []
+        for start in range(0, len(rows), page_size):
+            page = rows[start:start + page_size]
+            row_template = "(" + ", ".join(["%s"] * len(page[0])) + ")"
+            cur.execute(query.replace("%s", ", ".join([row_template] * len(page)), 1),
+                        [value for row in page for value in row])
+            if fetch:
+                results.extend(cur.fetchall())
+        return results if fetch else None
+
+    def local_day(self, column, alias):
+        # The [date] suffix makes sqlite3 convert the text result into a date
+        return f'local_date({column}, %s, %s) AS "{alias} [date]"'
+
+    def text_search(self, text, where):
+        # FTS5 has no Russian stemmer: every word is matched as a prefix instead
+        terms = " ".join(f'"{word}"*' for word in _WORD_RE.findall(text)) or '""'
+        return f"""
+            SELECT a.id, a.description, a.points, a.created_at
+            FROM achievements_fts
+            JOIN achievements a ON a.id = achievements_fts.rowid
+            WHERE achievements_fts MATCH %s AND {where}
+            ORDER BY bm25(achievements_fts), a.created_at DESC
+            LIMIT %s OFFSET %s
+        """, [terms]
+
+    def copy_rows(self, cur, table, columns, rows):
+        # No COPY in SQLite; executemany steps through the iterable lazily
+        placeholders = ", ".join(["%s"] * len(columns))
+        cur.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                        rows)
+
+    def copy_query(self, cur, query, params, out, fmt="csv"):
+        cur.execute(query, params)
+        columns = [column[0] for column in cur.description]
+        if fmt == "csv":
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(cur)
+        else:
+            for row in cur:
+                # Compact, like PostgreSQL's row_to_json
+                out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                                     separators=(",", ":"), default=_json_default) + "\n")
+
+    def lock_table(self, cur, table):
+        # Writers are already serialized by the database-wide write lock
+        pass
+
+    def _lock_file(self, key, blocking):
+        # Each attempt opens its own file: flock() excludes other processes and
+        # other open files of this one, so threads race fairly too
+        lock_file = open(f"{self.path}.lock-{key}", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        except BaseException:
+            lock_file.close()
+            raise
+        with self._locks_lock:
+            self._locks[key] = lock_file
+        return True
+
+    def advisory_lock(self, cur, key):
+        self._lock_file(key, blocking=True)
+
+    def try_advisory_lock(self, cur, key):
+        return self._lock_file(key, blocking=False)
+
+    def advisory_unlock(self, cur, key):
+        with self._locks_lock:
+            lock_file = self._locks.pop(key, None)
+        if lock_file is not None:
+            # Closing the file releases the lock
+            lock_file.close()
+
+
+BACKENDS = {
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the backend selected by DB_BACKEND (postgres or sqlite)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.getenv("DB_BACKEND", "postgres").lower()
+                if name not in BACKENDS:
+                    raise ValueError(
+                        f"Unknown DB_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+                _backend = BACKENDS[name]()
+    return _backend
@@ -0,0 +1,411 @@
+# src/database/bulk.py
+"""Bulk import and export of users, achievements and group colors.
+
+Both directions stream: exports COPY ... TO STDOUT straight into the
+output file, and imports validate the input row by row while feeding it
+to COPY ... FROM STDIN into a staging table, so memory stays flat
+whatever the file size. Files are CSV (with a header line) or JSON lines
+and refer to users by username, so they can move between databases.
+An achievements import applies its rows to user_stats, the leaderboard
+and the rollups as deltas for the imported users only, in the same
+transaction and without locking out concurrent writes.
+
+Usage (with src/ on PYTHONPATH):
+    python -m database.bulk export KIND [-o FILE] [--format csv|jsonl] [--user-id ID]
+    python -m database.bulk import KIND FILE [--format csv|jsonl] [--user-id ID] [--replace]
+
+KIND is users, achievements or group_colors; FILE may be '-' for stdin/stdout.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from itertools import groupby
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from consts import DB_TIMEZONE
+from database import derived, metrics
+from database.backends import get_backend
+from database.handlers import get_connection, get_read_connection
+from database.routing import get_router
+from grouping import extract_group
+
+KINDS = ("users", "achievements", "group_colors")
+FORMATS = ("csv", "jsonl")
+MAX_REPORTED_ERRORS = 20
+USERNAME_MAX_LENGTH = 50
+COLOR_RE = re.compile(r"#(?:[0-9A-Fa-f]{3}){1,2}")
+PASSWORD_HASH_RE = re.compile(r"[0-9a-f]{64}")
+# The entry form allows 5-50 points, sum-ups can carry more
+MAX_POINTS = int(os.getenv("IMPORT_MAX_POINTS", "10000"))
+# Imported rows are folded into the derived tables this many at a time
+DELTA_BATCH_SIZE = 5000
+
+EXPORT_QUERIES = {
+    "users": """
+        SELECT u.username, u.password_hash, u.created_at
+        FROM users u
+        {where}
+        ORDER BY u.id
+    """,
+    "achievements": """
+        SELECT u.username, a.description, a.points, a.created_at, a.category
+        FROM achievements a
+        JOIN users u ON u.id = a.user_id
+        {where}
+        ORDER BY a.id
+    """,
+    "group_colors": """
+        SELECT u.username, g.group_name, g.color
+        FROM group_colors g
+        JOIN users u ON u.id = g.user_id
+        {where}
+        ORDER BY u.id, g.group_name
+    """,
+}
+
+# kind -> staging table columns (name, type); rows are resolved to users by
+# user_id when importing into one account, by username otherwise
+STAGING_COLUMNS = {
+    "users": (("username", "TEXT"), ("password_hash", "TEXT"), ("created_at", "TIMESTAMP")),
+    "achievements": (("user_id", "INTEGER"), ("username", "TEXT"), ("description", "TEXT"),
+                     ("points", "INTEGER"), ("created_at", "TIMESTAMP"), ("category", "TEXT")),
+    "group_colors": (("user_id", "INTEGER"), ("username", "TEXT"), ("group_name", "TEXT"),
+                     ("color", "TEXT")),
+}
+
+
+class BulkImportError(ValueError):
+    """Raised when an import file has invalid rows; nothing is written."""
+
+    def __init__(self, errors, total):
+        self.errors = errors
+        self.total = total
+        more = f" (first {len(errors)} shown)" if total > len(errors) else ""
+        super().__init__(f"{total} invalid row(s){more}:\n" + "\n".join(errors))
+
+
+def format_for(path):
+    """Guess the file format from its name: .jsonl/.ndjson are JSON lines, the rest CSV."""
+    return "jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "csv"
+
+
+@metrics.instrument
+def export_rows(kind, out, fmt="csv", user_id=None):
+    """Stream kind (one of KINDS) into the text file out; user_id limits it to one user."""
+    where = "WHERE u.id = %s" if user_id is not None else ""
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            get_backend().copy_query(cur, EXPORT_QUERIES[kind].format(where=where),
+                                     (user_id,) if user_id is not None else None, out, fmt)
+
+
+def read_records(source, fmt="csv"):
+    """Yield (line number, record dict) from a CSV or JSON lines text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = ValueError(f"invalid JSON: {e.msg}")
+        if not isinstance(record, (dict, ValueError)):
+            record = ValueError("expected a JSON object")
+        yield line_number, record
+
+
+def _text(record, field, max_length=None):
+    value = record.get(field)
+    if value is None or not str(value).strip():
+        raise ValueError(f"{field} is required")
+    value = str(value)
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _points(record):
+    value = record.get("points")
+    try:
+        points = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"points must be an integer, got {value!r}") from None
+    if not 0 <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between 0 and {MAX_POINTS}, got {points}")
+    return points
+
+
+def _timestamp(record, field, default):
+    """Parse an ISO timestamp into a naive DB_TIMEZONE datetime; empty means default."""
+    value = record.get(field)
+    if value is None or not str(value).strip():
+        return default
+    try:
+        moment = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{field} is not an ISO timestamp: {value!r}") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(ZoneInfo(DB_TIMEZONE)).replace(tzinfo=None)
+    return moment
+
+
+def _owner(record, user_id):
+    if user_id is not None:
+        return user_id, None
+    return None, _text(record, "username", USERNAME_MAX_LENGTH)
+
+
+def _user_row(record, user_id, now):
+    password_hash = _text(record, "password_hash")
+    if not PASSWORD_HASH_RE.fullmatch(password_hash):
+        raise ValueError("password_hash must be 64 lowercase hex digits (SHA-256)")
+    return (_text(record, "username", USERNAME_MAX_LENGTH), password_hash,
+            _timestamp(record, "created_at", now))
+
+
+def _achievement_row(record, user_id, now):
+    description = _text(record, "description")
+    category = extract_group(description)[0]
+    given = record.get("category")
+    if given not in (None, "") and given != category:
+        raise ValueError(f"category {given!r} does not match the description's group {category!r}")
+    return _owner(record, user_id) + (
+        description, _points(record), _timestamp(record, "created_at", now), category)
+
+
+def _group_color_row(record, user_id, now):
+    color = _text(record, "color")
+    if not COLOR_RE.fullmatch(color):
+        raise ValueError(f"color must look like #RRGGBB or #RGB, got {color!r}")
+    return _owner(record, user_id) + (_text(record, "group_name"), color)
+
+
+ROW_PARSERS = {
+    "users": _user_row,
+    "achievements": _achievement_row,
+    "group_colors": _group_color_row,
+}
+
+
+def _valid_rows(kind, records, user_id, errors):
+    """Yield staging rows for valid records; collect the problems in errors.
+
+    errors is [reported messages, total count]; only the first
+    MAX_REPORTED_ERRORS messages are kept.
+    """
+    parse = ROW_PARSERS[kind]
+    # Timestamps missing from the file get the import time, like the column default
+    now = datetime.now(ZoneInfo(DB_TIMEZONE)).replace(tzinfo=None)
+    for line_number, record in records:
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            yield parse(record, user_id, now)
+        except ValueError as e:
+            errors[1] += 1
+            if len(errors[0]) < MAX_REPORTED_ERRORS:
+                errors[0].append(f"line {line_number}: {e}")
+
+
+def _check_staged(cur, kind, staging, errors):
+    """Bulk checks that need the whole file: unknown users, duplicate keys."""
+    if kind == "users":
+        return
+    cur.execute(f"""
+        SELECT DISTINCT s.username
+        FROM {staging} s
+        LEFT JOIN users u ON u.username = s.username
+        WHERE s.user_id IS NULL AND u.id IS NULL
+        ORDER BY s.username
+    """)
+    for (username,) in cur.fetchall():
+        errors[1] += 1
+        if len(errors[0]) < MAX_REPORTED_ERRORS:
+            errors[0].append(f"unknown user {username!r}")
+    if kind == "group_colors":
+        cur.execute(f"""
+            SELECT COALESCE(s.username, ''), s.group_name
+            FROM {staging} s
+            GROUP BY s.user_id, s.username, s.group_name
+            HAVING COUNT(*) > 1
+            ORDER BY 1, 2
+        """)
+        for username, group_name in cur.fetchall():
+            errors[1] += 1
+            if len(errors[0]) < MAX_REPORTED_ERRORS:
+                errors[0].append(f"group {group_name!r} of {username or 'user'} "
+                                 f"is listed more than once")
+
+
+def _owner_sql(staging):
+    return f"""
+        FROM {staging} s
+        LEFT JOIN users u ON u.username = s.username
+    """
+
+
+def _replace_achievements(cur, staging):
+    """Delete the staged users' achievements, subtracting them from the derived tables.
+
+    Rows are deleted DELTA_BATCH_SIZE at a time, so a user's whole history
+    is never held in memory.
+    """
+    cur.execute(f"SELECT DISTINCT COALESCE(s.user_id, u.id) {_owner_sql(staging)} ORDER BY 1")
+    for (owner_id,) in cur.fetchall():
+        while True:
+            cur.execute("""
+                DELETE FROM achievements
+                WHERE id IN (
+                    SELECT id FROM achievements WHERE user_id = %s ORDER BY id LIMIT %s
+                )
+                RETURNING points, created_at, category
+            """, (owner_id, DELTA_BATCH_SIZE))
+            removed = cur.fetchall()
+            if not removed:
+                break
+            derived.execute(cur, derived.removed(owner_id, removed))
+
+
+def _apply_deltas(cur, staging):
+    """Fold the staged achievements into the derived tables, user by user, in batches."""
+    with cur.connection.cursor(name=f"{staging}_deltas") as reader:
+        reader.itersize = DELTA_BATCH_SIZE
+        reader.execute(f"""
+            SELECT COALESCE(s.user_id, u.id), s.points, s.created_at, s.category
+            {_owner_sql(staging)}
+            ORDER BY 1
+        """)
+        for owner_id, rows in groupby(reader, key=lambda row: row[0]):
+            batch = []
+            for _, points, created_at, category in rows:
+                batch.append((points, created_at, category))
+                if len(batch) >= DELTA_BATCH_SIZE:
+                    derived.execute(cur, derived.added(owner_id, batch))
+                    batch = []
+            derived.execute(cur, derived.added(owner_id, batch))
+
+
+def _load(cur, kind, staging, replace):
+    """Move staged rows into their table; returns the number of rows written."""
+    owner = _owner_sql(staging)
+    if kind == "users":
+        cur.execute(f"""
+            INSERT INTO users (username, password_hash, created_at)
+            SELECT s.username, s.password_hash, s.created_at
+            FROM {staging} s
+            WHERE true
+            ON CONFLICT (username) DO NOTHING
+        """)
+    elif kind == "achievements":
+        if replace:
+            _replace_achievements(cur, staging)
+        cur.execute(f"""
+            INSERT INTO achievements (description, points, user_id, created_at, category)
+            SELECT s.description, s.points, COALESCE(s.user_id, u.id), s.created_at, s.category
+            {owner}
+        """)
+        written = cur.rowcount
+        _apply_deltas(cur, staging)
+        return written
+    else:
+        cur.execute(f"""
+            INSERT INTO group_colors (user_id, group_name, color)
+            SELECT COALESCE(s.user_id, u.id), s.group_name, s.color
+            {owner}
+            WHERE true
+            ON CONFLICT (user_id, group_name) DO UPDATE SET color = EXCLUDED.color
+        """)
+    return cur.rowcount
+
+
+@metrics.instrument
+def import_rows(kind, source, fmt="csv", user_id=None, replace=False):
+    """Import kind (one of KINDS) from the text stream source in one transaction.
+
+    With user_id every row goes to that user and usernames in the file are
+    ignored; otherwise rows are matched to existing users by username
+    (users themselves are added unless the username is taken). replace
+    deletes the affected users' achievements first. Returns the number of
+    rows written; raises BulkImportError, writing nothing, if any row is
+    invalid.
+    """
+    if kind == "users" and user_id is not None:
+        raise ValueError("Users are imported for the whole database, not for one user")
+    backend = get_backend()
+    staging = f"import_{kind}"
+    columns = STAGING_COLUMNS[kind]
+    errors = [[], 0]
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+            cur.execute(f"CREATE TEMP TABLE {staging} ("
+                        + ", ".join(f"{name} {type_}" for name, type_ in columns) + ")")
+            backend.copy_rows(cur, staging, [name for name, _ in columns],
+                              _valid_rows(kind, read_records(source, fmt), user_id, errors))
+            _check_staged(cur, kind, staging, errors)
+            if errors[1]:
+                raise BulkImportError(*errors)
+
+            written = _load(cur, kind, staging, replace)
+            cur.execute(f"DROP TABLE {staging}")
+
+    router = get_router()
+    if router is not None and user_id is not None:
+        router.note_write(user_id)
+    return written
+
+
+def _open(path, mode):
+    if path == "-":
+        return open((sys.stdin if "r" in mode else sys.stdout).fileno(), mode,
+                    encoding="utf-8", newline="", closefd=False)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.bulk")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write rows to a CSV/JSONL file")
+    export_parser.add_argument("kind", choices=KINDS)
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+
+    import_parser = subparsers.add_parser("import", help="Load rows from a CSV/JSONL file")
+    import_parser.add_argument("kind", choices=KINDS)
+    import_parser.add_argument("input", help="Input file, or - for stdin")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="Delete the users' existing achievements first")
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--format", choices=FORMATS, default=None,
+                               help="File format (default: from the file name, else csv)")
+        subparser.add_argument("--user-id", type=int, default=None,
+                               help="Only this user's rows / import everything into this user")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        with _open(args.output, "w") as out:
+            export_rows(args.kind, out, args.format or format_for(args.output), args.user_id)
+        return 0
+
+    try:
+        with _open(args.input, "r") as source:
+            written = import_rows(args.kind, source, args.format or format_for(args.input),
+                                  args.user_id, args.replace)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Imported {written} {args.kind} row(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
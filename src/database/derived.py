@@ -0,0 +1,85 @@
+# src/database/derived.py
+"""Writes that keep derived tables in step with achievements.
+
+user_stats, leaderboard_scores and the rollups change by deltas in the
+same transaction as every achievement insert or delete. The deltas are
+described as Statements, so the write handlers and bulk import, on both
+backends, and the asyncpg handlers run one copy of the SQL.
+"""
+from typing import NamedTuple, Optional
+
+from database import leaderboard, rollups
+from database.backends import get_backend
+
+DELTA_PAGE_SIZE = 1000
+
+USER_STATS_ADD_SQL = """
+    INSERT INTO user_stats (user_id, total_points, achievement_count, last_activity_at)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_points = user_stats.total_points + EXCLUDED.total_points,
+        achievement_count = user_stats.achievement_count + EXCLUDED.achievement_count,
+        last_activity_at = GREATEST(
+            COALESCE(user_stats.last_activity_at, EXCLUDED.last_activity_at),
+            EXCLUDED.last_activity_at)
+"""
+
+USER_STATS_REMOVE_SQL = """
+    UPDATE user_stats SET
+        total_points = total_points - %s,
+        achievement_count = achievement_count - %s,
+        last_activity_at = (
+            SELECT MAX(created_at) FROM achievements WHERE user_id = %s
+        )
+    WHERE user_id = %s
+"""
+
+class Statement(NamedTuple):
+    """SQL with %s placeholders and its parameters.
+
+    When values is set, the query has a single `VALUES %s` that takes
+    those rows, and params is unused.
+    """
+    query: str
+    params: tuple = ()
+    values: Optional[list] = None
+
+
+def _scores(user_id, rows, sign):
+    statements = [Statement(leaderboard.UPSERT_SQL,
+                            values=leaderboard.score_deltas(user_id, rows, sign))]
+    for grain, deltas in rollups.rollup_deltas(user_id, rows, sign).items():
+        table, _ = rollups.GRAINS[grain]
+        statements.append(Statement(rollups.upsert_sql(table), values=deltas))
+    if sign < 0:
+        statements.append(Statement(leaderboard.DELETE_EMPTY_SQL, (user_id,)))
+        for table, _ in rollups.GRAINS.values():
+            statements.append(Statement(rollups.delete_empty_sql(table), (user_id,)))
+    return statements
+
+
+def added(user_id, rows):
+    """Statements folding newly inserted (points, created_at, category) rows in."""
+    if not rows:
+        return []
+    return _scores(user_id, rows, 1) + [Statement(USER_STATS_ADD_SQL, (
+        user_id, sum(row[0] for row in rows), len(rows), max(row[1] for row in rows)))]
+
+
+def removed(user_id, rows):
+    """Statements subtracting deleted (points, created_at, category) rows."""
+    if not rows:
+        return []
+    return _scores(user_id, rows, -1) + [Statement(USER_STATS_REMOVE_SQL, (
+        sum(row[0] for row in rows), len(rows), user_id, user_id))]
+
+
+def execute(cur, statements):
+    """Run Statements on a psycopg2-style cursor."""
+    backend = get_backend()
+    for statement in statements:
+        if statement.values is None:
+            cur.execute(statement.query, statement.params)
+        elif statement.values:
+            backend.execute_values(cur, statement.query, statement.values,
+                                   page_size=DELTA_PAGE_SIZE)
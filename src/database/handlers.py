@@ -1,30 +1,174 @@
 # src/database/handlers.py
-import psycopg2
+import functools
 import hashlib
-import os
+import inspect
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from time import perf_counter
+from zoneinfo import ZoneInfo
+
+from consts import APP_TIMEZONE, DB_TIMEZONE
+from database import derived, leaderboard, metrics, rollups
+from database.backends import get_backend
+from database.routing import get_router
+from grouping import extract_group
+from models import Achievement
+
+# Rows per multi-row INSERT in bulk writes
+BULK_PAGE_SIZE = 1000
+# Rows fetched per round trip by streaming (server-side) cursors
+STREAM_BATCH_SIZE = 2000
+
+_pool = None
+_pool_lock = threading.Lock()
+# Per-thread read routing state, see retry_on_primary
+_reads = threading.local()
 
 
 def get_database_connection():
-    """Connect to the PostgreSQL database server."""
-    return psycopg2.connect(
-        host=os.getenv("POSTGRES_HOST", "postgres"),
-        database=os.getenv("POSTGRES_DB", "postgres"),
-        user=os.getenv("POSTGRES_USER", "postgres"),
-        password=os.getenv("POSTGRES_PASSWORD", "postgres")
-    )
+    """Open a new connection to the configured database backend."""
+    return get_backend().connect()
 
 
-def execute_query(query, params=None, fetch=False):
-    conn = get_database_connection()
-    cur = conn.cursor()
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = get_backend().create_pool()
+                metrics.registry.add_collector(_pool_gauges)
+    return _pool
+
+
+def _pool_gauges():
+    return {f"db_pool_{name}": value for name, value in _pool.stats().items()}
+
+
+@contextmanager
+def _checkout(pool, on_disconnect=None):
+    started = perf_counter()
+    conn = pool.getconn()
+    metrics.observe_pool_wait(perf_counter() - started)
     try:
-        cur.execute(query, params)
-        result = cur.fetchall() if fetch else None
+        yield conn
         conn.commit()
-        return result
-    finally:
-        cur.close()
-        conn.close()
+    except get_backend().disconnect_errors:
+        pool.putconn(conn, discard=True)
+        if on_disconnect is not None:
+            on_disconnect(pool)
+        raise
+    except BaseException:
+        pool.putconn(conn)
+        raise
+    else:
+        pool.putconn(conn)
+
+
+@contextmanager
+def get_connection():
+    """Check out a pooled primary connection; commit on success, roll back on error."""
+    with _checkout(get_pool()) as conn:
+        yield conn
+
+
+@contextmanager
+def get_read_connection(user_id=None):
+    """Check out a connection for read-only queries.
+
+    Served by a replica when POSTGRES_REPLICA_DSNS is set, unless user_id
+    has written within the read-your-writes window (see database.routing).
+    """
+    router = get_router()
+    pool = None
+    if router is not None and not getattr(_reads, "primary_only", False):
+        pool = router.pool_for_read(user_id)
+    if pool is None:
+        with get_connection() as conn:
+            yield conn
+    else:
+        try:
+            with _checkout(pool, on_disconnect=router.mark_down) as conn:
+                yield conn
+        except get_backend().disconnect_errors:
+            _reads.replica_failed = True
+            raise
+
+
+def retry_on_primary(func):
+    """Re-run a read handler once on the primary when its replica connection fails.
+
+    Generator handlers are only retried if nothing has been yielded yet.
+    """
+    def on_primary(call):
+        _reads.primary_only = True
+        try:
+            return call()
+        finally:
+            _reads.primary_only = False
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _reads.replica_failed = False
+            generator = func(*args, **kwargs)
+            try:
+                first = next(generator)
+            except StopIteration:
+                return
+            except get_backend().disconnect_errors:
+                if not _reads.replica_failed:
+                    raise
+                generator = func(*args, **kwargs)
+                try:
+                    first = on_primary(lambda: next(generator))
+                except StopIteration:
+                    return
+            yield first
+            yield from generator
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _reads.replica_failed = False
+        try:
+            return func(*args, **kwargs)
+        except get_backend().disconnect_errors:
+            if not _reads.replica_failed:
+                raise
+        return on_primary(lambda: func(*args, **kwargs))
+    return wrapper
+
+
+def _note_write(user_id):
+    router = get_router()
+    if router is not None:
+        router.note_write(user_id)
+
+
+def execute_query(query, params=None, fetch=False):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall() if fetch else None
+
+
+def local_day_bounds(start_date, end_date, tz=None):
+    """Turn an inclusive range of local dates into half-open DB timestamp bounds.
+
+    The bounds compare directly against created_at, so day filters stay
+    sargable on the (user_id, created_at) indexes. Either date may be None.
+    """
+    zone = ZoneInfo(tz or APP_TIMEZONE)
+    db_zone = ZoneInfo(DB_TIMEZONE)
+
+    def to_db(day):
+        return datetime.combine(day, time.min, zone).astimezone(db_zone).replace(tzinfo=None)
+
+    lower = to_db(start_date) if start_date is not None else None
+    upper = to_db(end_date + timedelta(days=1)) if end_date is not None else None
+    return lower, upper
 
 
 def hash_password(password):
@@ -32,128 +176,482 @@ def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+@metrics.instrument
 def register_user(username, password):
     """Register a new user."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-
-    # Check if user exists
-    cur.execute("SELECT id FROM users WHERE username = %s", (username,))
-    if cur.fetchone():
-        cur.close()
-        conn.close()
-        return False, "Пользователь уже существует"
-
-    # Add new user
-    hashed_password = hash_password(password)
-    cur.execute(
-        "INSERT INTO users (username, password_hash) VALUES (%s, %s)",
-        (username, hashed_password)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            # Check if user exists
+            cur.execute("SELECT id FROM users WHERE username = %s", (username,))
+            if cur.fetchone():
+                return False, "Пользователь уже существует"
+
+            # Add new user
+            hashed_password = hash_password(password)
+            cur.execute(
+                "INSERT INTO users (username, password_hash) VALUES (%s, %s) RETURNING id",
+                (username, hashed_password)
+            )
+            # Start the counters at zero so recompute_user_stats sees no drift
+            cur.execute("INSERT INTO user_stats (user_id) VALUES (%s)", (cur.fetchone()[0],))
     return True, "Регистрация успешна"
 
 
+@metrics.instrument
 def verify_user(username, password):
     """Verify user credentials."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-
     hashed_password = hash_password(password)
-    cur.execute(
-        "SELECT id FROM users WHERE username = %s AND password_hash = %s",
-        (username, hashed_password)
-    )
-    user = cur.fetchone()
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id FROM users WHERE username = %s AND password_hash = %s",
+                (username, hashed_password)
+            )
+            user = cur.fetchone()
     return user[0] if user else None
 
 
+def _record_added(cur, user_id, rows):
+    """Fold newly inserted (points, created_at, category) rows into user_stats,
+    the leaderboard and the rollups."""
+    derived.execute(cur, derived.added(user_id, rows))
+
+
+def _record_removed(cur, user_id, rows):
+    """Subtract deleted (points, created_at, category) rows from user_stats,
+    the leaderboard and the rollups."""
+    derived.execute(cur, derived.removed(user_id, rows))
+
+
+@metrics.instrument
 def add_achievement(description, points, user_id):
     """Add an achievement to the database."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO achievements (description, points, user_id) VALUES (%s, %s, %s)",
-        (description, points, user_id)
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO achievements (description, points, user_id, category) "
+                "VALUES (%s, %s, %s, %s) RETURNING points, created_at, category",
+                (description, points, user_id, extract_group(description)[0])
+            )
+            _record_added(cur, user_id, cur.fetchall())
+
+
+def _insert_achievements(cur, user_id, items):
+    """Insert (description, points) items with batched VALUES lists."""
+    if not items:
+        return
+    rows = get_backend().execute_values(
+        cur,
+        "INSERT INTO achievements (description, points, user_id, category) VALUES %s "
+        "RETURNING points, created_at, category",
+        [(description, points, user_id, extract_group(description)[0])
+         for description, points in items],
+        page_size=BULK_PAGE_SIZE,
+        fetch=True,
     )
-    conn.commit()
-    cur.close()
-    conn.close()
+    _record_added(cur, user_id, rows)
 
 
-def get_achievements(user_id):
-    """Get all achievements for a specific user."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, description, points, created_at 
-        FROM achievements 
-        WHERE user_id = %s 
-        ORDER BY created_at ASC
-    """, (user_id,))
-    achievements = cur.fetchall()
-    cur.close()
-    conn.close()
-    return achievements
+@metrics.instrument
+def add_achievements_bulk(user_id, items):
+    """Add many (description, points) achievements in a single transaction."""
+    items = list(items)
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            _insert_achievements(cur, user_id, items)
 
 
+@metrics.instrument
+@retry_on_primary
+def get_achievements(user_id):
+    """Get all achievements for a specific user."""
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, description, points, created_at 
+                FROM achievements 
+                WHERE user_id = %s 
+                ORDER BY created_at ASC
+            """, (user_id,))
+            return [Achievement.from_row(row) for row in cur]
+
+
+@metrics.instrument
+@retry_on_primary
+def get_achievements_between(user_id, start_date, end_date, tz=None):
+    """Get a user's achievements whose local day falls in [start_date, end_date].
+
+    A None date leaves that end of the range open.
+
+    Each Achievement carries local_day, bucketed in SQL using `tz`
+    (APP_TIMEZONE by default).
+    """
+    tz = tz or APP_TIMEZONE
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, description, points, created_at,
+                       {get_backend().local_day("created_at", "local_day")}
+                FROM achievements
+                WHERE user_id = %s
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                ORDER BY created_at ASC
+            """, (DB_TIMEZONE, tz, user_id, lower, lower, upper, upper))
+            return [Achievement.from_row(row) for row in cur]
+
+
+@metrics.instrument
+@retry_on_primary
+def get_categories(user_id, start_date=None, end_date=None, tz=None):
+    """Return the sorted categories a user has entries in, optionally within dates."""
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT category
+                FROM achievements
+                WHERE user_id = %s
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                ORDER BY category
+            """, (user_id, lower, lower, upper, upper))
+            return [row[0] for row in cur.fetchall()]
+
+
+@metrics.instrument
+@retry_on_primary
+def get_achievements_by_category(user_id, category, start_date=None, end_date=None, tz=None):
+    """Get a user's achievements in one category, optionally within dates."""
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, description, points, created_at
+                FROM achievements
+                WHERE user_id = %s AND category = %s
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                ORDER BY created_at ASC
+            """, (user_id, category, lower, lower, upper, upper))
+            return [Achievement.from_row(row) for row in cur]
+
+
+@metrics.instrument
+@retry_on_primary
+def iter_report_rows(user_id, start_date=None, end_date=None, tz=None):
+    """Stream (category, description) rows for a report, ordered by group then time.
+
+    Groups are ordered bytewise (COLLATE "C") to match Python's sorted().
+    """
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor(name="report_rows") as cur:
+            cur.itersize = STREAM_BATCH_SIZE
+            cur.execute("""
+                SELECT category, description
+                FROM achievements
+                WHERE user_id = %s
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                ORDER BY category COLLATE "C", created_at
+            """, (user_id, lower, lower, upper, upper))
+            yield from cur
+
+
+@metrics.instrument
+@retry_on_primary
+def search_achievements(user_id, text, category=None, start_date=None, end_date=None,
+                        limit=20, offset=0, tz=None):
+    """Full-text search over a user's achievement descriptions, best match first.
+
+    Optionally narrowed to a category and an inclusive range of local dates.
+    Returns a page of Achievements; an empty query matches nothing.
+    """
+    if not text or not text.strip():
+        return []
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    query, params = get_backend().text_search(text, """
+        a.user_id = %s
+        AND (%s::text IS NULL OR a.category = %s)
+        AND (%s::timestamp IS NULL OR a.created_at >= %s)
+        AND (%s::timestamp IS NULL OR a.created_at < %s)
+    """)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params + [user_id, category, category,
+                                         lower, lower, upper, upper, limit, offset])
+            return [Achievement.from_row(row) for row in cur]
+
+
+@metrics.instrument
 def delete_all_achievements(user_id):
     """Delete all achievements for a specific user."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM achievements WHERE user_id = %s", (user_id,))
-    conn.commit()
-    cur.close()
-    conn.close()
-
-
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM achievements WHERE user_id = %s "
+                "RETURNING points, created_at, category",
+                (user_id,)
+            )
+            _record_removed(cur, user_id, cur.fetchall())
+
+
+@metrics.instrument
 def delete_achievement(achievement_id, user_id):
     """Delete a specific achievement by its ID and user_id."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM achievements WHERE id = %s AND user_id = %s",
-        (achievement_id, user_id)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-
-
-def delete_achievements_by_category(category, user_id, start_date, end_date):
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM achievements WHERE id = %s AND user_id = %s "
+                "RETURNING points, created_at, category",
+                (achievement_id, user_id)
+            )
+            _record_removed(cur, user_id, cur.fetchall())
+
+
+@metrics.instrument
+def delete_achievements_by_category(category, user_id, start_date, end_date, tz=None):
     """Delete all achievements for a specific user and category within a date range."""
-    conn = get_database_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM achievements 
-        WHERE user_id = %s 
-        AND description LIKE %s 
-        AND DATE(created_at) BETWEEN DATE(%s) AND DATE(%s)
-    """, (user_id, f"{category}:%", start_date, end_date))
-    conn.commit()
-    cur.close()
-    conn.close()
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM achievements 
+                WHERE user_id = %s 
+                AND category = %s 
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                RETURNING points, created_at, category
+            """, (user_id, category, lower, lower, upper, upper))
+            _record_removed(cur, user_id, cur.fetchall())
+
+
+@metrics.instrument
+def replace_category_range(user_id, category, start_date, end_date, items, tz=None):
+    """Atomically replace a category's entries within dates by new (description, points) items.
+
+    The delete and the insert share one transaction, so a failure never
+    leaves the category half-deleted. Returns the number of rows removed.
+    """
+    items = list(items)
+    lower, upper = local_day_bounds(start_date, end_date, tz)
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM achievements
+                WHERE user_id = %s
+                AND category = %s
+                AND (%s::timestamp IS NULL OR created_at >= %s)
+                AND (%s::timestamp IS NULL OR created_at < %s)
+                RETURNING points, created_at, category
+            """, (user_id, category, lower, lower, upper, upper))
+            removed = cur.fetchall()
+            _record_removed(cur, user_id, removed)
+            _insert_achievements(cur, user_id, items)
+    return len(removed)
+
+
+@metrics.instrument
+@retry_on_primary
+def get_user_stats(user_id):
+    """Return the maintained aggregate for a user (primary-key lookup)."""
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT total_points, achievement_count, last_activity_at
+                FROM user_stats
+                WHERE user_id = %s
+            """, (user_id,))
+            row = cursor.fetchone()
+    if row is None:
+        return {'total_points': 0, 'achievement_count': 0, 'last_activity_at': None}
+    return {'total_points': row[0], 'achievement_count': row[1], 'last_activity_at': row[2]}
 
 
 def get_user_points(user_id):
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COALESCE(SUM(points), 0) as total_points 
-        FROM achievements 
-        WHERE user_id = %s
-    """, (user_id,))
-    total_points = cursor.fetchone()[0]
-    conn.close()
-    return total_points
+    return get_user_stats(user_id)['total_points']
+
+
+@metrics.instrument
+def recompute_user_stats(user_id=None):
+    """Rebuild user_stats from achievements and return the ids that had drifted.
+
+    Blocks achievement writes for the duration of the transaction so the
+    recomputed totals cannot race with concurrent inserts or deletes.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            get_backend().lock_table(cur, "achievements")
+            return update_user_stats(cur, user_id)
+
+
+def update_user_stats(cur, user_id=None):
+    """recompute_user_stats inside the caller's transaction (cur)."""
+    user_filter = "WHERE u.id = %s" if user_id is not None else ""
+    cur.execute(f"""
+        WITH actual AS (
+            SELECT u.id AS user_id,
+                   COALESCE(SUM(a.points), 0) AS total_points,
+                   COUNT(a.id) AS achievement_count,
+                   MAX(a.created_at) AS last_activity_at
+            FROM users u
+            LEFT JOIN achievements a ON a.user_id = u.id
+            {user_filter}
+            GROUP BY u.id
+        )
+        INSERT INTO user_stats (user_id, total_points, achievement_count, last_activity_at)
+        SELECT actual.user_id, actual.total_points, actual.achievement_count,
+               actual.last_activity_at
+        FROM actual
+        LEFT JOIN user_stats s ON s.user_id = actual.user_id
+        -- A missing row reads as zeros (see get_user_stats), so it only
+        -- drifted once the user has achievements
+        WHERE (s.user_id IS NULL AND actual.achievement_count > 0)
+           OR s.total_points <> actual.total_points
+           OR s.achievement_count <> actual.achievement_count
+           OR s.last_activity_at IS DISTINCT FROM actual.last_activity_at
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_points = EXCLUDED.total_points,
+            achievement_count = EXCLUDED.achievement_count,
+            last_activity_at = EXCLUDED.last_activity_at
+        RETURNING user_id
+    """, (user_id,) if user_id is not None else None)
+    return [row[0] for row in cur.fetchall()]
+
+
+@metrics.instrument
+def rebuild_leaderboard():
+    """Recompute leaderboard_scores from achievements; returns the rows written."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            get_backend().lock_table(cur, "achievements")
+            return leaderboard.rebuild(cur)
+
+
+@metrics.instrument
+def rebuild_rollups():
+    """Recompute daily_rollups and weekly_rollups; returns the rows written."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            get_backend().lock_table(cur, "achievements")
+            return rollups.rebuild(cur)
+
+
+@metrics.instrument
+@retry_on_primary
+def get_rollups(user_id, grain="day", start_date=None, end_date=None, category=None):
+    """Return (bucket, category, points, achievement_count) rows, oldest first.
+
+    grain is 'day' or 'week'; buckets are local dates in APP_TIMEZONE, and
+    start_date/end_date (inclusive) select the buckets containing them.
+    """
+    if grain not in rollups.GRAINS:
+        raise ValueError(f"Unknown rollup grain: {grain!r}")
+    table, _ = rollups.GRAINS[grain]
+    conditions, params = ["user_id = %s"], [user_id]
+    if start_date is not None:
+        conditions.append("bucket >= %s")
+        params.append(rollups.bucket_for(grain, start_date))
+    if end_date is not None:
+        conditions.append("bucket <= %s")
+        params.append(end_date)
+    if category is not None:
+        conditions.append("category = %s")
+        params.append(category)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT bucket, category, points, achievement_count
+                FROM {table}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY bucket, category
+            """, params)
+            return cur.fetchall()
+
+
+def _leaderboard_key(period, category, day):
+    if period not in leaderboard.PERIODS:
+        raise ValueError(f"Unknown leaderboard period: {period!r}")
+    day = day or datetime.now(ZoneInfo(APP_TIMEZONE)).date()
+    category = leaderboard.ALL_CATEGORIES if category is None else category
+    return period, leaderboard.period_bucket(period, day), category
+
+
+@metrics.instrument
+@retry_on_primary
+def get_leaderboard(period="all", category=None, limit=20, offset=0, day=None):
+    """Return a page of (rank, user_id, username, points), best first.
+
+    period is 'all', 'week' or 'month': the calendar week or month that
+    contains day (today in APP_TIMEZONE by default). category=None ranks
+    points across all categories. Equal points share a rank.
+    """
+    key = _leaderboard_key(period, category, day)
+    with get_read_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT s.user_id, u.username, s.points
+                FROM leaderboard_scores s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.period = %s AND s.bucket = %s AND s.category = %s
+                ORDER BY s.points DESC, s.user_id
+                LIMIT %s OFFSET %s
+            """, key + (limit, offset))
+            rows = cur.fetchall()
+            if not rows:
+                return []
+            cur.execute("""
+                SELECT COUNT(*) FROM leaderboard_scores
+                WHERE period = %s AND bucket = %s AND category = %s AND points > %s
+            """, key + (rows[0][2],))
+            rank = cur.fetchone()[0] + 1
+
+    page = []
+    for position, (user_id, username, points) in enumerate(rows):
+        if position and points < rows[position - 1][2]:
+            rank = offset + position + 1
+        page.append((rank, user_id, username, points))
+    return page
+
+
+@metrics.instrument
+@retry_on_primary
+def get_user_rank(user_id, period="all", category=None, day=None):
+    """Return {'rank', 'points', 'total'} for a user, or None if they have no points."""
+    key = _leaderboard_key(period, category, day)
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT points FROM leaderboard_scores
+                WHERE period = %s AND bucket = %s AND category = %s AND user_id = %s
+            """, key + (user_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            cur.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM leaderboard_scores
+                     WHERE period = %s AND bucket = %s AND category = %s AND points > %s),
+                    (SELECT COUNT(*) FROM leaderboard_scores
+                     WHERE period = %s AND bucket = %s AND category = %s)
+            """, key + (row[0],) + key)
+            ahead, total = cur.fetchone()
+    return {'rank': ahead + 1, 'points': row[0], 'total': total}
 
 
 def get_user_level_info(user_id):
-    total_points = get_user_points(user_id)
+    return level_info_from_points(get_user_points(user_id))
+
+
+def level_info_from_points(total_points):
     level = total_points // 60 + 1
     points_in_level = total_points % 60
     return {
@@ -164,29 +662,17 @@ def get_user_level_info(user_id):
     }
 
 
+@metrics.instrument
+@retry_on_primary
 def get_all_users():
     """Return list of tuples (user_id, username) for all users"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    return users
-
-
-def create_group_colors_table():
-    query = '''
-    CREATE TABLE IF NOT EXISTS group_colors (
-        user_id INTEGER,
-        group_name TEXT,
-        color TEXT,
-        PRIMARY KEY (user_id, group_name),
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    '''
-    execute_query(query)
+    with get_read_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, username FROM users")
+            return cursor.fetchall()
 
 
+@metrics.instrument
 def save_group_color(user_id, group_name, color):
     query = '''
     INSERT INTO group_colors (user_id, group_name, color)
@@ -194,13 +680,36 @@ def save_group_color(user_id, group_name, color):
     ON CONFLICT (user_id, group_name) 
     DO UPDATE SET color = EXCLUDED.color
     '''
+    _note_write(user_id)
     execute_query(query, (user_id, group_name, color))
 
 
-def get_group_colors(user_id):
-    query = 'SELECT group_name, color FROM group_colors WHERE user_id = %s'
-    results = execute_query(query, (user_id,), fetch=True)
-    return {row[0]: row[1] for row in results}
+@metrics.instrument
+def get_session_epoch(user_id):
+    """Return the user's session epoch, or None for an unknown user."""
+    # Read from the primary: a lagging replica would resurrect revoked tokens
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT session_epoch FROM users WHERE id = %s', (user_id,))
+            row = cur.fetchone()
+            return row[0] if row else None
+
+
+@metrics.instrument
+def revoke_sessions(user_id):
+    """Invalidate every session token issued to the user so far."""
+    _note_write(user_id)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('UPDATE users SET session_epoch = session_epoch + 1 WHERE id = %s',
+                        (user_id,))
 
-# Add this to your initialization code
-create_group_colors_table()
+
+@metrics.instrument
+@retry_on_primary
+def get_group_colors(user_id):
+    with get_read_connection(user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT group_name, color FROM group_colors WHERE user_id = %s',
+                        (user_id,))
+            return {row[0]: row[1] for row in cur.fetchall()}
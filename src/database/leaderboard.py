@@ -0,0 +1,116 @@
+# src/database/leaderboard.py
+"""Maintained leaderboard scores.
+
+`leaderboard_scores` holds one row per (period, bucket, category, user)
+with the user's points in that bucket: all-time, the calendar week
+(starting Monday) and the calendar month, each globally (category
+ALL_CATEGORIES) and per category. Buckets are local dates in
+APP_TIMEZONE. Write handlers apply deltas (see database.derived) in the
+same transaction as the achievement change, so ranking reads never touch
+`achievements`.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from consts import APP_TIMEZONE, DB_TIMEZONE
+from database.backends import get_backend
+
+PERIODS = ("all", "week", "month")
+ALL_CATEGORIES = ""  # never produced by extract_group
+ALL_TIME_BUCKET = date(1970, 1, 1)
+REBUILD_BATCH_SIZE = 5000
+
+
+def period_bucket(period, day):
+    """Return the first local date of the period bucket containing day."""
+    if period == "all":
+        return ALL_TIME_BUCKET
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown leaderboard period: {period!r}")
+
+
+def local_date(created_at, tz=None):
+    """Local date in tz (APP_TIMEZONE) of a naive DB timestamp."""
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    moment = created_at.replace(tzinfo=ZoneInfo(DB_TIMEZONE))
+    return moment.astimezone(ZoneInfo(tz or APP_TIMEZONE)).date()
+
+
+def score_deltas(user_id, rows, sign=1):
+    """Aggregate (points, created_at, category) rows into sorted upsert tuples.
+
+    Returns (period, bucket, category, user_id, points) tuples; sorting keeps
+    the row lock order stable across concurrent writers.
+    """
+    deltas = defaultdict(int)
+    for points, created_at, category in rows:
+        day = local_date(created_at)
+        for period in PERIODS:
+            bucket = period_bucket(period, day)
+            deltas[(period, bucket, ALL_CATEGORIES)] += points * sign
+            deltas[(period, bucket, category)] += points * sign
+    return [(period, bucket, category, user_id, points)
+            for (period, bucket, category), points in sorted(deltas.items())]
+
+
+UPSERT_SQL = """
+    INSERT INTO leaderboard_scores (period, bucket, category, user_id, points)
+    VALUES %s
+    ON CONFLICT (period, bucket, category, user_id) DO UPDATE SET
+        points = leaderboard_scores.points + EXCLUDED.points
+"""
+
+DELETE_EMPTY_SQL = "DELETE FROM leaderboard_scores WHERE user_id = %s AND points <= 0"
+
+
+def create_table(cur):
+    for statement in (
+        """
+        CREATE TABLE IF NOT EXISTS leaderboard_scores (
+            period TEXT NOT NULL,
+            bucket DATE NOT NULL,
+            category TEXT NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            points INTEGER NOT NULL,
+            PRIMARY KEY (period, bucket, category, user_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS leaderboard_scores_rank_idx
+            ON leaderboard_scores (period, bucket, category, points DESC, user_id)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS leaderboard_scores_user_idx
+            ON leaderboard_scores (user_id)
+        """,
+    ):
+        cur.execute(statement)
+
+
+def rebuild(cur):
+    """Recompute every score from achievements; returns the number of rows written."""
+    totals = defaultdict(int)
+    with cur.connection.cursor(name="leaderboard_rebuild") as reader:
+        reader.itersize = REBUILD_BATCH_SIZE
+        reader.execute("""
+            SELECT user_id, points, created_at, category
+            FROM achievements
+            WHERE user_id IS NOT NULL
+        """)
+        for user_id, points, created_at, category in reader:
+            day = local_date(created_at)
+            for period in PERIODS:
+                bucket = period_bucket(period, day)
+                totals[(period, bucket, ALL_CATEGORIES, user_id)] += points
+                totals[(period, bucket, category, user_id)] += points
+
+    cur.execute("DELETE FROM leaderboard_scores")
+    rows = [key + (points,) for key, points in sorted(totals.items()) if points > 0]
+    if rows:
+        get_backend().execute_values(cur, UPSERT_SQL, rows, page_size=1000)
+    return len(rows)
@@ -0,0 +1,56 @@
+# src/database/maintenance.py
+"""Maintenance commands for derived data.
+
+Usage (with src/ on PYTHONPATH):
+    python -m database.maintenance recompute-stats [--user-id ID]
+    python -m database.maintenance rebuild-leaderboard
+    python -m database.maintenance rebuild-rollups
+"""
+import argparse
+
+import database.handlers as handlers
+
+
+def recompute_stats(args):
+    drifted = handlers.recompute_user_stats(args.user_id)
+    if drifted:
+        print(f"Repaired user_stats for {len(drifted)} user(s): "
+              f"{', '.join(map(str, drifted))}")
+    else:
+        print("user_stats is consistent with achievements")
+
+
+def rebuild_leaderboard(args):
+    rows = handlers.rebuild_leaderboard()
+    print(f"Rebuilt leaderboard_scores: {rows} row(s)")
+
+
+def rebuild_rollups(args):
+    rows = handlers.rebuild_rollups()
+    print(f"Rebuilt daily_rollups and weekly_rollups: {rows} row(s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser(
+        "recompute-stats", help="Rebuild per-user points/level counters")
+    stats_parser.add_argument("--user-id", type=int, default=None,
+                              help="Only recompute this user")
+    stats_parser.set_defaults(func=recompute_stats)
+
+    leaderboard_parser = subparsers.add_parser(
+        "rebuild-leaderboard", help="Recompute leaderboard scores from achievements")
+    leaderboard_parser.set_defaults(func=rebuild_leaderboard)
+
+    rollups_parser = subparsers.add_parser(
+        "rebuild-rollups", help="Recompute daily and weekly rollups from achievements")
+    rollups_parser.set_defaults(func=rebuild_rollups)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
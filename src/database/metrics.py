@@ -0,0 +1,308 @@
+# src/database/metrics.py
+"""Query metrics for the data layer.
+
+Handlers decorated with `instrument` record their latency, call count and
+outcome; statements run through `InstrumentedCursor` record their latency
+and row count under the handler that issued them, and statements slower
+than SLOW_QUERY_MS are logged with literals and parameters redacted.
+Everything is kept in process memory and exposed in the Prometheus text
+format by `render_prometheus()` or, when METRICS_PORT is set, over HTTP.
+"""
+import functools
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from psycopg2.extensions import cursor as _cursor
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements slower than this are logged; a negative value disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_MAX_LENGTH = 500
+
+slow_query_logger = logging.getLogger("database.slow_queries")
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+_current = threading.local()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Thread-safe store of counters and histograms keyed by (metric, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, metric, kind, text):
+        self._help[metric] = (kind, text)
+
+    def inc(self, metric, labels=(), amount=1):
+        key = (metric, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, metric, value, labels=()):
+        key = (metric, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        """Register collect() -> {metric: value}, read as gauges at render time."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h.counts), h.total, h.count)
+                          for key, h in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        lines = []
+        described = set()
+
+        def header(metric, default_kind):
+            if metric not in described:
+                described.add(metric)
+                kind, text = self._help.get(metric, (default_kind, ""))
+                if text:
+                    lines.append(f"# HELP {metric} {text}")
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (metric, labels), value in sorted(counters.items()):
+            header(metric, "counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            header(metric, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                le = labels + (("le", repr(bound)),)
+                lines.append(f"{metric}_bucket{_format_labels(le)} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+
+        for collect in collectors:
+            for metric, value in sorted(collect().items()):
+                header(metric, "gauge")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels)
+    return "{" + pairs + "}"
+
+
+registry = Registry()
+registry.describe("db_handler_calls_total", "counter", "Handler calls by outcome")
+registry.describe("db_handler_duration_seconds", "histogram", "Handler latency")
+registry.describe("db_query_duration_seconds", "histogram", "Statement latency by handler")
+registry.describe("db_query_rows_total", "counter", "Rows returned or affected by handler")
+registry.describe("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS")
+registry.describe("db_pool_wait_seconds", "histogram", "Time spent waiting for a pooled connection")
+
+
+def current_handler():
+    return getattr(_current, "handler", None) or "other"
+
+
+def instrument(func):
+    """Record latency, call count and outcome of a handler under its name."""
+    name = func.__name__
+
+    def record(started, status, outer):
+        _current.handler = outer
+        registry.observe("db_handler_duration_seconds", time.perf_counter() - started,
+                         (("handler", name),))
+        registry.inc("db_handler_calls_total", (("handler", name), ("status", status)))
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Time the whole iteration, not just creating the generator
+            outer = getattr(_current, "handler", None)
+            started = time.perf_counter()
+            status = "error"
+            generator = func(*args, **kwargs)
+            try:
+                while True:
+                    _current.handler = name
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        break
+                    _current.handler = outer
+                    yield item
+                status = "ok"
+            except GeneratorExit:
+                # The caller stopped iterating early
+                status = "ok"
+                raise
+            finally:
+                _current.handler = name
+                generator.close()
+                record(started, status, outer)
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_current, "handler", None)
+        _current.handler = name
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            record(started, status, outer)
+    return wrapper
+
+
+def observe_pool_wait(seconds):
+    registry.observe("db_pool_wait_seconds", seconds)
+
+
+def redact(query):
+    """Collapse whitespace and replace literal values in a statement with `?`."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    query = _LITERAL_RE.sub("?", _SPACE_RE.sub(" ", str(query)).strip())
+    if len(query) > SLOW_QUERY_MAX_LENGTH:
+        query = query[:SLOW_QUERY_MAX_LENGTH] + "..."
+    return query
+
+
+def _param_types(params):
+    if params is None:
+        return "none"
+    if isinstance(params, dict):
+        return ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items())
+    return ", ".join(type(value).__name__ for value in params)
+
+
+def record_query(query, params, seconds, rows):
+    handler = current_handler()
+    labels = (("handler", handler),)
+    registry.observe("db_query_duration_seconds", seconds, labels)
+    if rows > 0:
+        registry.inc("db_query_rows_total", labels, rows)
+    if 0 <= SLOW_QUERY_MS <= seconds * 1000:
+        registry.inc("db_slow_queries_total", labels)
+        # Only parameter types are logged: values may hold personal data
+        slow_query_logger.warning(
+            "Slow query in %s: %.1f ms, %d row(s): %s [params: %s]",
+            handler, seconds * 1000, rows, redact(query), _param_types(params))
+
+
+class InstrumentedCursor(_cursor):
+    """psycopg2 cursor that reports every statement to the metrics registry."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, vars, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, None, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_query(sql, None, time.perf_counter() - started, max(self.rowcount, 0))
+
+
+def render_prometheus():
+    """Return the current metrics in the Prometheus text format."""
+    return registry.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """Serve /metrics from a daemon thread once per process.
+
+    Uses METRICS_PORT and METRICS_HOST (default 127.0.0.1) when not given;
+    does nothing and returns None when no port is configured.
+    """
+    global _server
+    port = port if port is not None else os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(
+                (host or os.getenv("METRICS_HOST", "127.0.0.1"), int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server",
+                             daemon=True).start()
+    return _server
@@ -0,0 +1,301 @@
+# src/database/migrations.py
+"""Versioned schema migrations.
+
+Each migration runs once, in order, inside its own transaction and is
+recorded in `schema_migrations`. A session-level advisory lock keeps
+concurrently starting containers from applying the same step twice.
+Steps are written to be idempotent so databases created by the old
+init scripts can be brought under version control.
+
+SQLite databases get the same versions written in the SQLite dialect
+(SQLITE_MIGRATIONS); there the advisory lock is a file lock next to the
+database file.
+"""
+from database import leaderboard, rollups
+from database.backends import get_backend
+from grouping import extract_group
+
+MIGRATION_LOCK_ID = 72_001
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _script(cur, script):
+    # sqlite3 runs one statement per execute()
+    for statement in script.split(";"):
+        if statement.strip():
+            cur.execute(statement)
+
+
+def _base_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password_hash VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS achievements (
+            id SERIAL PRIMARY KEY,
+            description TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            user_id INTEGER REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS group_colors (
+            user_id INTEGER,
+            group_name TEXT,
+            color TEXT,
+            PRIMARY KEY (user_id, group_name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+    """)
+
+
+def _user_stats(cur):
+    _script(cur, """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id),
+            total_points INTEGER NOT NULL DEFAULT 0,
+            achievement_count INTEGER NOT NULL DEFAULT 0,
+            last_activity_at TIMESTAMP
+        );
+
+        INSERT INTO user_stats (user_id, total_points, achievement_count, last_activity_at)
+        SELECT u.id, COALESCE(SUM(a.points), 0), COUNT(a.id), MAX(a.created_at)
+        FROM users u
+        LEFT JOIN achievements a ON a.user_id = u.id
+        GROUP BY u.id
+        ON CONFLICT (user_id) DO NOTHING;
+    """)
+
+
+def _achievement_category(cur):
+    cur.execute("ALTER TABLE achievements ADD COLUMN IF NOT EXISTS category TEXT")
+
+    # Backfill in Python so stored categories match extract_group exactly.
+    conn = cur.connection
+    with conn.cursor(name="category_backfill") as reader:
+        reader.itersize = BACKFILL_BATCH_SIZE
+        reader.execute("SELECT id, description FROM achievements WHERE category IS NULL")
+        while True:
+            rows = reader.fetchmany(BACKFILL_BATCH_SIZE)
+            if not rows:
+                break
+            get_backend().execute_values(cur, """
+                UPDATE achievements AS a SET category = v.category
+                FROM (VALUES %s) AS v (id, category)
+                WHERE a.id = v.id
+            """, [(row_id, extract_group(description)[0]) for row_id, description in rows])
+
+    cur.execute("""
+        ALTER TABLE achievements ALTER COLUMN category SET NOT NULL;
+
+        CREATE INDEX IF NOT EXISTS achievements_user_created_idx
+            ON achievements (user_id, created_at);
+        CREATE INDEX IF NOT EXISTS achievements_user_category_created_idx
+            ON achievements (user_id, category, created_at);
+    """)
+
+
+def _job_runs(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job_name TEXT PRIMARY KEY,
+            last_slot TIMESTAMPTZ NOT NULL,
+            finished_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def _leaderboard(cur):
+    leaderboard.create_table(cur)
+    leaderboard.rebuild(cur)
+
+
+def _rollups(cur):
+    rollups.create_tables(cur)
+    rollups.rebuild(cur)
+
+
+def _search(cur):
+    cur.execute("""
+        ALTER TABLE achievements ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('russian', description) || to_tsvector('english', description)
+            ) STORED
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS achievements_search_idx
+            ON achievements USING GIN (search_vector)
+    """)
+
+
+def _session_epoch(cur):
+    cur.execute("""
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS session_epoch INTEGER NOT NULL DEFAULT 0
+    """)
+
+
+MIGRATIONS = [
+    (1, "base tables", _base_tables),
+    (2, "user stats", _user_stats),
+    (3, "achievement category and indexes", _achievement_category),
+    (4, "scheduled job runs", _job_runs),
+    (5, "leaderboard scores", _leaderboard),
+    (6, "daily and weekly rollups", _rollups),
+    (7, "full-text search", _search),
+    (8, "session epochs", _session_epoch),
+]
+
+
+def _sqlite_base_tables(cur):
+    _script(cur, """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password_hash VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            user_id INTEGER REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS group_colors (
+            user_id INTEGER,
+            group_name TEXT,
+            color TEXT,
+            PRIMARY KEY (user_id, group_name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+
+def _sqlite_achievement_category(cur):
+    cur.execute("SELECT name FROM pragma_table_info('achievements')")
+    if "category" not in {row[0] for row in cur.fetchall()}:
+        # SQLite cannot add NOT NULL later, so the column starts out empty
+        cur.execute("ALTER TABLE achievements ADD COLUMN category TEXT NOT NULL DEFAULT ''")
+    cur.execute("SELECT id, description FROM achievements WHERE category = ''")
+    rows = cur.fetchall()
+    cur.executemany("UPDATE achievements SET category = %s WHERE id = %s",
+                    [(extract_group(description)[0], row_id) for row_id, description in rows])
+    _script(cur, """
+        CREATE INDEX IF NOT EXISTS achievements_user_created_idx
+            ON achievements (user_id, created_at);
+        CREATE INDEX IF NOT EXISTS achievements_user_category_created_idx
+            ON achievements (user_id, category, created_at)
+    """)
+
+
+def _sqlite_job_runs(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job_name TEXT PRIMARY KEY,
+            last_slot TIMESTAMPTZ NOT NULL,
+            finished_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _sqlite_search(cur):
+    # External-content FTS5 index kept in sync with achievements by triggers
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS achievements_fts USING fts5(
+            description, content='achievements', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS achievements_fts_insert AFTER INSERT ON achievements
+        BEGIN
+            INSERT INTO achievements_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS achievements_fts_delete AFTER DELETE ON achievements
+        BEGIN
+            INSERT INTO achievements_fts (achievements_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS achievements_fts_update
+        AFTER UPDATE OF description ON achievements
+        BEGIN
+            INSERT INTO achievements_fts (achievements_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO achievements_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    """)
+    cur.execute("INSERT INTO achievements_fts (achievements_fts) VALUES ('rebuild')")
+
+
+def _sqlite_session_epoch(cur):
+    cur.execute("PRAGMA table_info(users)")
+    if "session_epoch" not in {row[1] for row in cur.fetchall()}:
+        cur.execute("ALTER TABLE users ADD COLUMN session_epoch INTEGER NOT NULL DEFAULT 0")
+
+
+SQLITE_MIGRATIONS = [
+    (1, "base tables", _sqlite_base_tables),
+    (2, "user stats", _user_stats),
+    (3, "achievement category and indexes", _sqlite_achievement_category),
+    (4, "scheduled job runs", _sqlite_job_runs),
+    (5, "leaderboard scores", _leaderboard),
+    (6, "daily and weekly rollups", _rollups),
+    (7, "full-text search", _sqlite_search),
+    (8, "session epochs", _sqlite_session_epoch),
+]
+
+
+def migrations_for(backend):
+    return SQLITE_MIGRATIONS if backend.name == "sqlite" else MIGRATIONS
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn, log=print):
+    """Apply every pending migration and return the versions applied."""
+    applied_now = []
+    backend = get_backend()
+    with conn.cursor() as cur:
+        backend.advisory_lock(cur, MIGRATION_LOCK_ID)
+        try:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+
+            applied = applied_versions(cur)
+            for version, name, step in migrations_for(backend):
+                if version in applied:
+                    continue
+                log(f"Applying migration {version}: {name}...")
+                step(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                conn.commit()
+                applied_now.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            backend.advisory_unlock(cur, MIGRATION_LOCK_ID)
+            conn.commit()
+    return applied_now
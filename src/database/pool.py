@@ -0,0 +1,176 @@
+# src/database/pool.py
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolError(Exception):
+    """Base class for connection pool errors."""
+
+
+class PoolTimeout(PoolError):
+    """No connection became available within the checkout timeout."""
+
+
+class PoolExhausted(PoolError):
+    """Too many callers are already waiting for a connection."""
+
+
+class _Entry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections.
+
+    Connections are checked out with `getconn()` and handed back with
+    `putconn()`. When every connection is busy, callers wait up to
+    `timeout` seconds in a queue of at most `max_waiters`. Connections idle
+    for longer than `check_after` seconds are pinged before reuse, and
+    connections older than `max_lifetime` seconds are recycled.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=10.0,
+                 max_waiters=50, check_after=30.0, max_lifetime=3600.0):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Expected 0 <= minconn <= maxconn and maxconn >= 1")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+
+        self._idle = []
+        self._entries = {}
+        self._size = 0
+        self._waiters = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(minconn):
+            self._size += 1
+            entry = self._open()
+            self._idle.append(entry)
+
+    def _open(self):
+        try:
+            entry = _Entry(self._connect())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._entries[id(entry.conn)] = entry
+        return entry
+
+    def _close(self, entry):
+        self._entries.pop(id(entry.conn), None)
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, entry, now):
+        return self.max_lifetime is not None and now - entry.created_at > self.max_lifetime
+
+    def _is_healthy(self, entry, now):
+        """Detect connections dropped by the server while idle in the pool."""
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if now - entry.last_used < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting for one to be returned if needed."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    entry = None
+                    break
+                if self._waiters >= self.max_waiters:
+                    raise PoolExhausted(
+                        f"{self._waiters} callers already waiting for a connection")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No connection available after {self.timeout:.1f}s")
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+        if entry is not None:
+            now = time.monotonic()
+            if not self._is_expired(entry, now) and self._is_healthy(entry, now):
+                return entry.conn
+            # Replace the stale connection while keeping its slot.
+            self._close(entry)
+        return self._open().conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is unusable."""
+        entry = self._entries.get(id(conn))
+        if entry is None:
+            raise PoolError("Connection does not belong to this pool")
+
+        now = time.monotonic()
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed or self._is_expired(entry, now):
+                self._close(entry)
+                self._size -= 1
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            for entry in self._idle:
+                self._close(entry)
+                self._size -= 1
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiters,
+                'maxconn': self.maxconn,
+            }
@@ -0,0 +1,105 @@
+# src/database/rollups.py
+"""Per-user time-series rollups.
+
+`daily_rollups` and `weekly_rollups` hold one row per (user, category,
+bucket) with the points and number of achievements in that bucket; a
+bucket is a local date in APP_TIMEZONE (weeks start on Monday). Write
+handlers apply deltas (see database.derived) in the same transaction as
+the achievement change, so heatmaps and trend charts read a few hundred
+aggregated rows instead of the raw history.
+"""
+from collections import defaultdict
+
+from database.backends import get_backend
+from database.leaderboard import local_date, period_bucket
+
+# grain -> (table, leaderboard period whose buckets it uses)
+GRAINS = {
+    "day": ("daily_rollups", None),
+    "week": ("weekly_rollups", "week"),
+}
+REBUILD_BATCH_SIZE = 5000
+
+
+def bucket_for(grain, day):
+    """Return the first local date of the grain bucket containing day."""
+    _, period = GRAINS[grain]
+    return day if period is None else period_bucket(period, day)
+
+
+def upsert_sql(table):
+    return f"""
+        INSERT INTO {table} (user_id, category, bucket, points, achievement_count)
+        VALUES %s
+        ON CONFLICT (user_id, category, bucket) DO UPDATE SET
+            points = {table}.points + EXCLUDED.points,
+            achievement_count = {table}.achievement_count + EXCLUDED.achievement_count
+    """
+
+
+def rollup_deltas(user_id, rows, sign=1):
+    """Aggregate (points, created_at, category) rows into per-grain upsert tuples.
+
+    Returns {grain: sorted (user_id, category, bucket, points, count) tuples}.
+    """
+    deltas = {grain: defaultdict(lambda: [0, 0]) for grain in GRAINS}
+    for points, created_at, category in rows:
+        day = local_date(created_at)
+        for grain in GRAINS:
+            delta = deltas[grain][(category, bucket_for(grain, day))]
+            delta[0] += points * sign
+            delta[1] += sign
+    return {grain: [(user_id, category, bucket, points, count)
+                    for (category, bucket), (points, count) in sorted(by_key.items())]
+            for grain, by_key in deltas.items()}
+
+
+def delete_empty_sql(table):
+    return f"DELETE FROM {table} WHERE user_id = %s AND achievement_count <= 0"
+
+
+def create_tables(cur):
+    for table, _ in GRAINS.values():
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                category TEXT NOT NULL,
+                bucket DATE NOT NULL,
+                points INTEGER NOT NULL,
+                achievement_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, category, bucket)
+            )
+        """)
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_user_bucket_idx
+                ON {table} (user_id, bucket)
+        """)
+
+
+def rebuild(cur):
+    """Recompute every rollup from achievements; returns the number of rows written."""
+    totals = {grain: defaultdict(lambda: [0, 0]) for grain in GRAINS}
+    with cur.connection.cursor(name="rollups_rebuild") as reader:
+        reader.itersize = REBUILD_BATCH_SIZE
+        reader.execute("""
+            SELECT user_id, points, created_at, category
+            FROM achievements
+            WHERE user_id IS NOT NULL
+        """)
+        for user_id, points, created_at, category in reader:
+            day = local_date(created_at)
+            for grain in GRAINS:
+                total = totals[grain][(user_id, category, bucket_for(grain, day))]
+                total[0] += points
+                total[1] += 1
+
+    written = 0
+    backend = get_backend()
+    for grain, by_key in totals.items():
+        table, _ = GRAINS[grain]
+        cur.execute(f"DELETE FROM {table}")
+        rows = [key + (points, count) for key, (points, count) in sorted(by_key.items())]
+        if rows:
+            backend.execute_values(cur, upsert_sql(table), rows, page_size=1000)
+        written += len(rows)
+    return written
@@ -0,0 +1,177 @@
+# src/database/routing.py
+"""Routing of read-only queries to PostgreSQL replicas.
+
+Replicas listed in POSTGRES_REPLICA_DSNS serve the read handlers in
+round-robin order. A replica is skipped while it is unreachable or its
+replay lag exceeds REPLICA_MAX_LAG_SECONDS, and reads fall back to the
+primary when no replica qualifies. A user who has just written reads
+from the primary for READ_YOUR_WRITES_SECONDS, so their own changes are
+visible on the next rerun even if the replicas are behind.
+
+Probes run on the reader's thread, so replica connections get a
+connect_timeout and the lag query a statement_timeout of
+REPLICA_CONNECT_TIMEOUT seconds: an unreachable replica delays one read
+by at most that long before it is skipped.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from psycopg2.extensions import make_dsn, parse_dsn
+
+from database import metrics
+from database.backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+_PASSWORD_RE = re.compile(r"(password=|://[^:/@]*:)[^\s@]*")
+
+# Seconds of replay lag; 0 when the replica has replayed everything it received
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+metrics.registry.describe("db_read_routes_total", "counter", "Read connections by target")
+
+
+class Replica:
+    __slots__ = ("dsn", "pool", "lag", "healthy", "checked_at", "lock")
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.pool = None
+        self.lag = None
+        self.healthy = False
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+
+class ReplicaRouter:
+    def __init__(self, dsns, max_lag=5.0, check_interval=5.0, read_your_writes=5.0,
+                 connect_timeout=2.0):
+        self.replicas = [Replica(_with_connect_timeout(dsn, connect_timeout)) for dsn in dsns]
+        self.connect_timeout = connect_timeout
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self._next = 0
+        self._lock = threading.Lock()
+        self._recent_writes = {}
+
+    def note_write(self, user_id):
+        """Pin user_id's reads to the primary for the read-your-writes window."""
+        if user_id is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes[user_id] = now
+            if len(self._recent_writes) > 10_000:
+                cutoff = now - self.read_your_writes
+                self._recent_writes = {
+                    uid: at for uid, at in self._recent_writes.items() if at > cutoff}
+
+    def wrote_recently(self, user_id):
+        with self._lock:
+            written_at = self._recent_writes.get(user_id)
+        return written_at is not None and time.monotonic() - written_at < self.read_your_writes
+
+    def _check(self, replica):
+        """Refresh a replica's health and lag at most once per check interval."""
+        now = time.monotonic()
+        if replica.checked_at is not None and now - replica.checked_at < self.check_interval:
+            return
+        # Only one caller probes; the others use the previous state meanwhile
+        if not replica.lock.acquire(blocking=False):
+            return
+        try:
+            replica.checked_at = now
+            if replica.pool is None:
+                replica.pool = get_backend().create_pool(replica.dsn)
+            conn = replica.pool.getconn()
+            discard = False
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"SET LOCAL statement_timeout = {int(self.connect_timeout * 1000)}")
+                    cur.execute(LAG_QUERY)
+                    replica.lag = float(cur.fetchone()[0])
+                conn.rollback()
+            except Exception:
+                discard = True
+                raise
+            finally:
+                replica.pool.putconn(conn, discard=discard)
+            replica.healthy = True
+        except Exception as e:
+            if replica.healthy or replica.lag is None:
+                logger.warning("Replica %s unavailable: %s", _safe_dsn(replica.dsn), e)
+            replica.healthy = False
+        finally:
+            replica.lock.release()
+
+    def mark_down(self, pool):
+        """Take the replica owning pool out of rotation until its next check."""
+        for replica in self.replicas:
+            if replica.pool is pool:
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+
+    def pool_for_read(self, user_id=None):
+        """Return a replica pool for a read, or None to use the primary."""
+        if user_id is not None and self.wrote_recently(user_id):
+            metrics.registry.inc("db_read_routes_total", (("target", "primary"),))
+            return None
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            self._check(replica)
+            if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag:
+                metrics.registry.inc("db_read_routes_total", (("target", "replica"),))
+                return replica.pool
+        metrics.registry.inc("db_read_routes_total", (("target", "primary"),))
+        return None
+
+
+def _with_connect_timeout(dsn, seconds):
+    """Add connect_timeout to dsn unless it sets one already."""
+    if "connect_timeout" in parse_dsn(dsn):
+        return dsn
+    # libpq takes whole seconds and treats anything below 2 as 2
+    return make_dsn(dsn, connect_timeout=max(2, round(seconds)))
+
+
+def _safe_dsn(dsn):
+    # Keep passwords out of the logs, for both URI and key=value DSNs
+    return _PASSWORD_RE.sub(r"\1***", dsn)
+
+
+_router = None
+_router_lock = threading.Lock()
+_configured = False
+
+
+def get_router():
+    """Return the process-wide router, or None when no replicas are configured."""
+    global _router, _configured
+    if not _configured:
+        with _router_lock:
+            if not _configured:
+                dsns = [dsn.strip() for dsn in
+                        os.getenv("POSTGRES_REPLICA_DSNS", "").split(";") if dsn.strip()]
+                if dsns and get_backend().name == "postgres":
+                    _router = ReplicaRouter(
+                        dsns,
+                        max_lag=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5")),
+                        check_interval=float(os.getenv("REPLICA_CHECK_INTERVAL", "5")),
+                        read_your_writes=float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")),
+                        connect_timeout=float(os.getenv("REPLICA_CONNECT_TIMEOUT", "2")),
+                    )
+                _configured = True
+    return _router
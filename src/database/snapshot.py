@@ -0,0 +1,28 @@
+# src/database/snapshot.py
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Tuple
+
+import database.handlers as handlers
+from models import Achievement
+
+
+class UserSnapshot(NamedTuple):
+    """Read-only view of a user's data shared by every section of a rerun."""
+    user_id: int
+    achievements: Tuple[Achievement, ...]
+    total_points: int
+    level_info: Mapping
+    group_colors: Mapping
+
+
+def load_user_snapshot(user_id):
+    """Load achievements, totals and group colors for a user in one pass."""
+    achievements = tuple(handlers.get_achievements(user_id))
+    total_points = handlers.get_user_points(user_id)
+    return UserSnapshot(
+        user_id=user_id,
+        achievements=achievements,
+        total_points=total_points,
+        level_info=MappingProxyType(handlers.level_info_from_points(total_points)),
+        group_colors=MappingProxyType(handlers.get_group_colors(user_id)),
+    )
@@ -0,0 +1,13 @@
+from functools import lru_cache
+
+DEFAULT_GROUP = "ДРУГОЕ"
+EXTRACT_GROUP_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=EXTRACT_GROUP_CACHE_SIZE)
+def extract_group(description):
+    """Split 'GROUP: text' into (group, text); untagged text goes to DEFAULT_GROUP."""
+    head, separator, rest = description.partition(":")
+    if separator and head.strip().isupper():
+        return head.strip(), rest.strip()
+    return DEFAULT_GROUP, description
@@ -0,0 +1,241 @@
+# src/jobs/scheduler.py
+"""In-process job scheduler with cluster-wide leader election.
+
+Every web replica runs one scheduler thread per process. When a job's
+cron slot comes due, the replica that wins `pg_try_advisory_lock` for
+that job runs it and records the slot in `job_runs`; the others skip it,
+so each slot runs exactly once across the cluster.
+"""
+import logging
+import threading
+import zlib
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import database.handlers as handlers
+from consts import APP_TIMEZONE
+from database.backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+JOB_LOCK_NAMESPACE = 72_002
+# Upper bound on how long the scheduler thread sleeps before re-checking.
+MAX_IDLE_SECONDS = 60
+
+_FIELD_RANGES = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+]
+
+
+def _parse_field(spec, low, high):
+    values = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {step_text}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron value out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """A five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Supports `*`, lists, ranges and steps. Day-of-week uses 0 or 7 for
+    Sunday. As in cron, when both day fields are restricted a day matches
+    if either of them does.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {len(fields)}: {expression!r}")
+        self.expression = expression
+        parsed = [_parse_field(spec, low, high)
+                  for spec, (_, low, high) in zip(fields, _FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt):
+        # Python weekday(): Monday=0; cron: Sunday=0
+        cron_weekday = (dt.weekday() + 1) % 7
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt):
+        """Return the first matching minute strictly after dt."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Four years covers every satisfiable day-of-month/month combination.
+        limit = dt + timedelta(days=366 * 4)
+        while dt < limit:
+            if dt.month not in self.months:
+                year, month = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+                dt = dt.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r})"
+
+
+class Job:
+    __slots__ = ("name", "schedule", "func", "next_run")
+
+    def __init__(self, name, schedule, func, next_run):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.next_run = next_run
+
+
+def job_lock_key(name):
+    """Stable bigint advisory-lock key for a job name."""
+    return (JOB_LOCK_NAMESPACE << 32) | zlib.crc32(name.encode("utf-8"))
+
+
+class Scheduler:
+    """Runs registered jobs on their cron schedules from a single thread."""
+
+    def __init__(self, tz=APP_TIMEZONE):
+        self.tz = ZoneInfo(tz)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def add_job(self, name, cron, func):
+        """Register func under name; re-registering a name replaces the job."""
+        schedule = cron if isinstance(cron, CronSchedule) else CronSchedule(cron)
+        with self._lock:
+            self._jobs[name] = Job(name, schedule, func, schedule.next_after(self.now()))
+        self._wakeup.set()
+
+    def has_job(self, name):
+        with self._lock:
+            return name in self._jobs
+
+    def start(self):
+        """Start the scheduler thread unless it is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._loop, name="job-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                now = self.now()
+                due_runs = []
+                for job in self._jobs.values():
+                    if job.next_run <= now:
+                        # The scheduled time identifies the run across replicas.
+                        due_runs.append((job, job.next_run))
+                        job.next_run = job.schedule.next_after(now)
+                upcoming = min((job.next_run for job in self._jobs.values()), default=None)
+
+            for job, slot in due_runs:
+                self.run_job(job, slot)
+
+            if upcoming is None:
+                timeout = MAX_IDLE_SECONDS
+            else:
+                timeout = min(MAX_IDLE_SECONDS, max(0.0, (upcoming - self.now()).total_seconds()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def run_job(self, job, slot):
+        """Run job for slot if this replica wins the lease and nobody ran it yet."""
+        key = job_lock_key(job.name)
+        backend = get_backend()
+        try:
+            with handlers.get_connection() as conn:
+                with conn.cursor() as cur:
+                    if not backend.try_advisory_lock(cur, key):
+                        logger.info("Job %s is running on another replica", job.name)
+                        return False
+                    try:
+                        cur.execute(
+                            "SELECT last_slot FROM job_runs WHERE job_name = %s", (job.name,))
+                        row = cur.fetchone()
+                        conn.commit()
+                        if row is not None and row[0] >= slot:
+                            logger.info("Job %s already ran for %s", job.name, slot)
+                            return False
+
+                        logger.info("Running job %s for %s", job.name, slot)
+                        job.func()
+
+                        cur.execute("""
+                            INSERT INTO job_runs (job_name, last_slot, finished_at)
+                            VALUES (%s, %s, CURRENT_TIMESTAMP)
+                            ON CONFLICT (job_name) DO UPDATE SET
+                                last_slot = EXCLUDED.last_slot,
+                                finished_at = EXCLUDED.finished_at
+                        """, (job.name, slot))
+                        conn.commit()
+                        return True
+                    finally:
+                        conn.rollback()
+                        backend.advisory_unlock(cur, key)
+        except Exception:
+            logger.exception("Job %s failed", job.name)
+            return False
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
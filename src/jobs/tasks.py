@@ -0,0 +1,36 @@
+# src/jobs/tasks.py
+"""Background jobs shared by every replica.
+
+Usage (with src/ on PYTHONPATH), to run the jobs in a dedicated process:
+    python -m jobs.tasks
+"""
+import logging
+import os
+import threading
+
+from consts import REPORTS_DIR
+from jobs.scheduler import get_scheduler
+
+REPORT_EXPORT_CRON = os.getenv('REPORT_EXPORT_CRON', '0 7 * * *')
+RUN_BACKGROUND_JOBS = os.getenv('RUN_BACKGROUND_JOBS', '1') == '1'
+
+
+def export_reports_job():
+    # Imported lazily: the export engine is only needed when the job fires.
+    from reports.export import export_reports
+    export_reports(REPORTS_DIR)
+
+
+def start_background_jobs():
+    """Register the built-in jobs and start this process's scheduler once."""
+    scheduler = get_scheduler()
+    if not scheduler.has_job("export_reports"):
+        scheduler.add_job("export_reports", REPORT_EXPORT_CRON, export_reports_job)
+    scheduler.start()
+    return scheduler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s")
+    start_background_jobs()
+    threading.Event().wait()
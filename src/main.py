@@ -1,18 +1,26 @@
+import io
 import json
+from html import escape
 import os
 from pathlib import Path
 import streamlit as st
-from datetime import date, datetime, timedelta
+from datetime import timedelta
+from auth import (get_bootstrap, invalidate_bootstrap, issue_session_token, revoke_sessions,
+                  verify_session_token)
 import database.handlers as handlers
-from streamlit_extras.let_it_rain import rain
+from database import bulk
+from database.metrics import start_metrics_server
+from database.snapshot import load_user_snapshot
+from jobs.tasks import RUN_BACKGROUND_JOBS, start_background_jobs
+from reports.text import iter_user_report
 import random
-from streamlit_extras.stateful_button import button
-import threading
-import time
+from view.achievement_list import achievement_list
 from view.animations import show_achievement_animation, show_level_up_animation
-from view.render import create_daily_journey_html, render_flag, render_level_progress
+from view.charts import heatmap_chart, trend_chart
+from view.render import create_daily_journey_html, render_level_progress
 from view.style_and_content_consts import GROUP_COLORS
-from view.utils import extract_group, get_random_quote, format_date, format_datetime
+from view.utils import (adjust_time, extract_group, get_random_quote, format_date,
+                        format_datetime, local_today)
 
 st.set_page_config(page_title="Трекер достижений")
 
@@ -36,6 +44,35 @@ if 'current_emoji' not in st.session_state:
     st.session_state.current_emoji = "🏆"
 if 'current_quote' not in st.session_state:
     st.session_state.current_quote = get_random_quote()
+if 'snapshot' not in st.session_state:
+    st.session_state.snapshot = None
+
+
+def get_snapshot():
+    """Return the current user's data, loading it at most once per rerun."""
+    snapshot = st.session_state.snapshot
+    if snapshot is None or snapshot.user_id != st.session_state.user_id:
+        snapshot = load_user_snapshot(st.session_state.user_id)
+        st.session_state.snapshot = snapshot
+    return snapshot
+
+
+def invalidate_snapshot():
+    """Drop the cached snapshot after a write so the next read sees it."""
+    st.session_state.snapshot = None
+
+
+def start_session(user_id):
+    """Attach user_id to this browser session and load its bootstrap data."""
+    st.session_state.user_id = user_id
+    st.session_state.group_colors = dict(get_bootstrap(user_id)['group_colors'])
+
+
+def resume_session():
+    """Restore the user from a signed ?session= token via the bootstrap cache."""
+    user_id = verify_session_token(st.query_params.get("session"))
+    if user_id is not None:
+        start_session(user_id)
 
 
 def login_form():
@@ -51,10 +88,9 @@ def login_form():
         if login_submit and username and password:
             user_id = handlers.verify_user(username, password)
             if user_id:
-                st.session_state.user_id = user_id
                 # Load saved colors after login
-                st.session_state.group_colors = handlers.get_group_colors(
-                    user_id)
+                start_session(user_id)
+                st.query_params["session"] = issue_session_token(user_id)
                 st.success("Успешный вход!")
                 st.rerun()
             else:
@@ -69,70 +105,40 @@ def login_form():
 
 
 def generate_report_text(user_id, start_date=None):
-    achievements = handlers.get_achievements(user_id)
-    groups = {}
-
-    for achievement in achievements:
-        # Skip achievements that are earlier than the start_date if provided
-        if start_date and achievement[3].date() < start_date:
-            continue
+    return "".join(iter_user_report(user_id, start_date))
 
-        group_name, achievement_text = extract_group(achievement[1])
-        if group_name not in groups:
-            groups[group_name] = []
-        groups[group_name].append((achievement_text, achievement[2], achievement[3]))
 
-    if start_date:
-        text_content = f"Мои достижения с {format_date(start_date)}:\n\n"
-    else:
-        text_content = "Мои достижения:\n\n"
+# Background jobs run on one scheduler per process, created on first use.
+# Deployments that run `python -m jobs.tasks` separately switch this off.
+if RUN_BACKGROUND_JOBS:
+    start_background_jobs()
+# Data-layer metrics on http://METRICS_HOST:METRICS_PORT/metrics when configured
+start_metrics_server()
 
-    for group_name in sorted(groups.keys()):
-        group_achievements = groups[group_name]
-        total_points = sum(points for _, points, _ in group_achievements)
-        text_content += f"- {group_name}:\n"
-        for achievement_text, points, _ in group_achievements:
-            text_content += f"  - {achievement_text}\n"
-        text_content += "\n"
 
-    return text_content
-
-
-def backup_report():
-    while True:
-        now = datetime.now()
-        if now.hour == 7 and now.minute == 0:
-            # Get all users and generate reports
-            users = handlers.get_all_users()
-            for user_id, username in users:
-                report_text = generate_report_text(user_id)
-                with open('/app/reports/report.txt', 'a', encoding='utf-8') as f:
-                    f.write(
-                        f"\n=== Report for {username} - {format_date(now.date())} ===\n")
-                    f.write(report_text)
-                    f.write("\n")
-            time.sleep(60)  # Wait a minute to avoid multiple writes
-        time.sleep(30)  # Check every 30 seconds
+# Each section below is a fragment: interacting with its widgets reruns only
+# that section and reuses the snapshot loaded by the last full run. Writes
+# call the app-wide st.rerun() so every section picks up the new data.
+def refresh_quote():
+    st.session_state.current_quote = get_random_quote()
 
 
-# Start backup thread when app starts
-backup_thread = threading.Thread(target=backup_report, daemon=True)
-backup_thread.start()
+def set_confirm_delete(value):
+    st.session_state.confirm_delete = value
 
 
-def main_app():
-    st.title("Трекер достижений")
-    # Quote section
+@st.fragment
+def quote_section():
     quote_col, button_col = st.columns([5, 1])
     with quote_col:
         st.markdown(f"*{st.session_state.current_quote}*")
     with button_col:
-        if st.button("🔄"):
-            st.session_state.current_quote = get_random_quote()
-            st.rerun()
+        st.button("🔄", on_click=refresh_quote)
 
-    # Get and display level info
-    level_info = handlers.get_user_level_info(st.session_state.user_id)
+
+def level_section():
+    # No widgets here, so this only runs on full reruns, i.e. after writes
+    level_info = get_snapshot().level_info
     st.markdown(render_level_progress(level_info), unsafe_allow_html=True)
 
     # Check for level up
@@ -142,10 +148,9 @@ def main_app():
         show_level_up_animation(level_info['level'])
         st.session_state.last_level = level_info['level']
 
-    if st.button("Выйти"):
-        st.session_state.user_id = None
-        st.rerun()
 
+@st.fragment
+def entry_form_section():
     with st.form(f"achievement_form_{st.session_state.form_key}"):
         description = st.text_area(
             "Ваш вклад в ваши цели", key=f"desc_{st.session_state.form_key}", height=70)
@@ -169,18 +174,18 @@ def main_app():
             st.session_state.group_colors[group_name] = new_color
             handlers.save_group_color(
                 st.session_state.user_id, group_name, new_color)
+            invalidate_bootstrap(st.session_state.user_id)
 
         handlers.add_achievement(description, points, st.session_state.user_id)
+        invalidate_snapshot()
         st.session_state.show_animation = points
         st.session_state.form_key += 1
         st.rerun()
 
-    # Add Group Color Management section
-    existing_groups = set()
-    achievements = handlers.get_achievements(st.session_state.user_id)
-    for achievement in achievements:
-        group_name, _ = extract_group(achievement[1])
-        existing_groups.add(group_name)
+
+@st.fragment
+def color_management_section():
+    existing_groups = {achievement.group for achievement in get_snapshot().achievements}
 
     if existing_groups:
         col1, col2 = st.columns([2, 1])
@@ -197,15 +202,15 @@ def main_app():
             # Save color to database
             handlers.save_group_color(
                 st.session_state.user_id, selected_group, new_color)
+            invalidate_bootstrap(st.session_state.user_id)
+            invalidate_snapshot()
             st.rerun()
     else:
         st.info("Добавьте достижения чтобы управлять цветами групп")
 
-    # Show animation if needed
-    if st.session_state.show_animation is not None:
-        show_achievement_animation(st.session_state.show_animation)
-        st.session_state.show_animation = None
 
+@st.fragment
+def delete_all_section():
     col1, col2 = st.columns(2)
     with col1:
         # Add confirmation state to session if not exists
@@ -213,24 +218,23 @@ def main_app():
             st.session_state.confirm_delete = False
 
         if not st.session_state.confirm_delete:
-            if st.button("Удалить все достижения"):
-                st.session_state.confirm_delete = True
-                st.rerun()
+            st.button("Удалить все достижения", on_click=set_confirm_delete, args=(True,))
         else:
             st.warning("Вы уверены, что хотите удалить все достижения?")
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Да, удалить"):
                     handlers.delete_all_achievements(st.session_state.user_id)
+                    invalidate_snapshot()
                     st.session_state.confirm_delete = False
                     st.session_state.expanded_groups = set()
                     st.rerun()
             with col2:
-                if st.button("Отмена"):
-                    st.session_state.confirm_delete = False
-                    st.rerun()
+                st.button("Отмена", on_click=set_confirm_delete, args=(False,))
+
 
-    # Move the report generation under the delete section (outside both columns)
+@st.fragment
+def report_section():
     st.subheader("Генерация отчёта")
     report_col1, report_col2 = st.columns([3, 1])
 
@@ -250,26 +254,34 @@ def main_app():
         text_content = generate_report_text(st.session_state.user_id, report_start_date)
         with st.expander("Текст для копирования", expanded=True):
             st.code(text_content, language=None)
+            st.download_button("⬇️ Скачать", text_content, file_name="report.txt",
+                               mime="text/plain")
             st.button("Копировать", type="primary",
                       on_click=lambda: st.write(
                           f'<script>navigator.clipboard.writeText(`{text_content}`)</script>',
                           unsafe_allow_html=True
                       ))
 
-    achievements = handlers.get_achievements(st.session_state.user_id)
+
+@st.fragment
+def group_list_section():
+    snapshot = get_snapshot()
 
     # Group achievements
     groups = {}
-    color_index = 0
     available_colors = set(GROUP_COLORS)
 
+    # Saved colors win over the random ones assigned during this session
+    for group_name, color in snapshot.group_colors.items():
+        st.session_state.group_colors.setdefault(group_name, color)
+
     # Remove already used colors from available_colors
     for color in st.session_state.group_colors.values():
         if color in available_colors:
             available_colors.remove(color)
 
-    for achievement in achievements:
-        group_name, achievement_text = extract_group(achievement[1])
+    for achievement in snapshot.achievements:
+        group_name = achievement.group
         if group_name not in groups:
             groups[group_name] = []
             # If group doesn't have a color, assign a random one from available colors
@@ -282,8 +294,7 @@ def main_app():
                     # If no colors available, pick a random one from the full palette
                     st.session_state.group_colors[group_name] = random.choice(
                         GROUP_COLORS)
-        groups[group_name].append(
-            (achievement[0], achievement_text, achievement[2], achievement[3]))
+        groups[group_name].append(achievement)
 
     # Clean up deleted groups from session state
     existing_groups = set(groups.keys())
@@ -312,53 +323,102 @@ def main_app():
 
         if is_expanded:
             st.session_state.expanded_groups.add(group_name)
-            for achievement_id, text, points, created_at in group_achievements:
-                col1, col2, col3 = st.columns([3, 1, 1])
-                with col1:
-                    st.write(f"{text}")
-                    st.caption(f"Добавлено: {format_datetime(created_at)}")
-                with col2:
-                    st.markdown(render_flag(points, color),
-                                unsafe_allow_html=True)
-                with col3:
-                    if st.button("🗑️", key=f"delete_{achievement_id}"):
-                        handlers.delete_achievement(
-                            achievement_id, st.session_state.user_id)
-                        remaining_achievements = [
-                            a for a in group_achievements if a[0] != achievement_id]
-                        if not remaining_achievements:
-                            st.session_state.expanded_groups.remove(group_name)
-                        st.rerun()
+            deleted_id = achievement_list(
+                group_achievements, color, key=f"list_{group_name}")
+            if deleted_id is not None:
+                handlers.delete_achievement(deleted_id, st.session_state.user_id)
+                invalidate_snapshot()
+                remaining_achievements = [
+                    a for a in group_achievements if a.id != deleted_id]
+                if not remaining_achievements:
+                    st.session_state.expanded_groups.remove(group_name)
+                st.rerun()
         else:
             st.session_state.expanded_groups.discard(group_name)
 
-    # In your main_app function, update the daily journey button handler:
+
+SEARCH_PAGE_SIZE = 20
+
+
+def set_search_page(page):
+    st.session_state.search_page = max(page, 0)
+
+
+@st.fragment
+def search_section():
+    st.subheader("Поиск")
+    snapshot = get_snapshot()
+    categories = sorted({achievement.group for achievement in snapshot.achievements})
+
+    text = st.text_input("Найти достижения", key="search_text",
+                         placeholder="например: отчёт или python",
+                         on_change=set_search_page, args=(0,))
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        category = st.selectbox("Категория", [None] + categories,
+                                format_func=lambda value: "Все" if value is None else value,
+                                key="search_category", on_change=set_search_page, args=(0,))
+    with col2:
+        start_date = st.date_input("С даты", value=None, key="search_start_date",
+                                   on_change=set_search_page, args=(0,))
+    with col3:
+        end_date = st.date_input("По дату", value=None, key="search_end_date",
+                                 on_change=set_search_page, args=(0,))
+
+    if not text.strip():
+        return
+    page = st.session_state.get("search_page", 0)
+    results = handlers.search_achievements(
+        st.session_state.user_id, text, category, start_date, end_date,
+        limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+    if not results and page == 0:
+        st.info("Ничего не найдено")
+        return
+
+    for achievement in results:
+        color = st.session_state.group_colors.get(achievement.group, '#4CAF50')
+        day = f"{format_datetime(achievement.created_at)} {adjust_time(achievement.created_at).year}"
+        st.markdown(
+            f'<span style="color: {color};">●</span> <b>{escape(achievement.group)}</b>: '
+            f'{escape(achievement.text)} — {achievement.points} очков '
+            f'<span style="color: #666;">({day})</span>',
+            unsafe_allow_html=True
+        )
+
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        st.button("◀ Назад", key="search_prev", disabled=page == 0,
+                  on_click=set_search_page, args=(page - 1,))
+    with next_col:
+        st.button("Дальше ▶", key="search_next", disabled=len(results) < SEARCH_PAGE_SIZE,
+                  on_click=set_search_page, args=(page + 1,))
+
+
+@st.fragment
+def daily_journey_section():
     if st.button("📅 Daily Journey"):
-        achievements = handlers.get_achievements(st.session_state.user_id)
-        today = date.today()
+        today = local_today()
         daily_achievements = [
             {
-                "description": desc,
-                "points": points,
-                "created_at": created_at.strftime("%H:%M"),
-                "color": st.session_state.group_colors.get(extract_group(desc)[0], '#4CAF50')
+                "description": achievement.description,
+                "points": achievement.points,
+                "created_at": adjust_time(achievement.created_at).strftime("%H:%M"),
+                "color": st.session_state.group_colors.get(achievement.group, '#4CAF50')
             }
-            for _, desc, points, created_at in achievements
-            if created_at.date() == today
+            for achievement in handlers.get_achievements_between(
+                st.session_state.user_id, today, today)
         ]
 
         if not daily_achievements:
             st.info("No achievements recorded today yet!")
         else:
             st.subheader("Your Journey Today")
-            html_content = create_daily_journey_html(daily_achievements)
-            st.components.v1.html(
-                html_content,
-                height=len(daily_achievements) * 120 + 100,
-                scrolling=True
-            )
+            html_content, height = create_daily_journey_html(daily_achievements)
+            st.components.v1.html(html_content, height=height, scrolling=True)
+
 
-    # Daily Report Section
+@st.fragment
+def daily_report_section():
     st.subheader("📋 Daily Report")
 
     # Date navigation
@@ -369,11 +429,11 @@ def main_app():
             if 'report_date' in st.session_state:
                 st.session_state.report_date = st.session_state.report_date - timedelta(days=1)
             else:
-                st.session_state.report_date = date.today() - timedelta(days=1)
+                st.session_state.report_date = local_today() - timedelta(days=1)
 
     with col2:
         if 'report_date' not in st.session_state:
-            st.session_state.report_date = date.today()
+            st.session_state.report_date = local_today()
         report_date = st.date_input(
             "Select date to view achievements",
             value=st.session_state.report_date,
@@ -385,33 +445,18 @@ def main_app():
         if st.button("▶"):
             st.session_state.report_date = st.session_state.report_date + timedelta(days=1)
 
-    # Get achievements for selected date
-    daily_achievements = [
-        achievement for achievement in achievements
-        if achievement[3].date() == st.session_state.report_date
-    ]
+    # Generate report text for selected date
+    report_text = "".join(iter_user_report(
+        st.session_state.user_id,
+        st.session_state.report_date,
+        st.session_state.report_date,
+        title=f"Achievements for {format_date(st.session_state.report_date)}:\n\n",
+        skip_empty=True,
+    ))
 
-    if not daily_achievements:
+    if not report_text:
         st.info(f"No achievements recorded on {format_date(st.session_state.report_date)}")
     else:
-        # Generate report text for selected date
-        report_text = f"Achievements for {format_date(st.session_state.report_date)}:\n\n"
-        groups = {}
-
-        for achievement in daily_achievements:
-            group_name, achievement_text = extract_group(achievement[1])
-            if group_name not in groups:
-                groups[group_name] = []
-            groups[group_name].append((achievement_text, achievement[2]))
-
-        for group_name in sorted(groups.keys()):
-            group_achievements = groups[group_name]
-            total_points = sum(points for _, points in group_achievements)
-            report_text += f"- {group_name}:\n"
-            for achievement_text, points in group_achievements:
-                report_text += f"  - {achievement_text}\n"
-            report_text += "\n"
-
         with st.expander("View Report", expanded=True):
             # Apply text wrapping using CSS
             st.markdown(
@@ -433,10 +478,11 @@ def main_app():
                 )
                 st.success("Report copied to clipboard!")
 
-    # Update "To sum up" section
+
+@st.fragment
+def sum_up_section():
     st.subheader("To sum up")
-    achievements = handlers.get_achievements(st.session_state.user_id)
-    today = date.today()
+    today = local_today()
 
     # Add date range selection
     col1, col2 = st.columns(2)
@@ -445,39 +491,24 @@ def main_app():
     with col2:
         end_date = st.date_input("To date", value=today)
 
-    # Filter achievements by date range
-    filtered_achievements = [
-        achievement for achievement in achievements
-        if start_date <= achievement[3].date() <= end_date
-    ]
-
-    categories = list(set(extract_group(achievement[1])[0]
-                          for achievement in filtered_achievements))
+    categories = handlers.get_categories(
+        st.session_state.user_id, start_date, end_date)
 
     if categories:
         selected_category = st.selectbox("Select category", categories)
 
         # Display filtered achievements for selected category
-        category_achievements = [
-            achievement for achievement in filtered_achievements
-            if extract_group(achievement[1])[0] == selected_category
-        ]
+        category_achievements = handlers.get_achievements_by_category(
+            st.session_state.user_id, selected_category, start_date, end_date)
 
         # Calculate total points for the category
-        total_points = sum(ach[2] for ach in category_achievements)
+        total_points = sum(ach.points for ach in category_achievements)
         st.write(f"Total points for {selected_category}: {total_points}")
 
         # Display achievements with flags
-        for achievement_id, text, points, created_at in category_achievements:
-            _, achievement_text = extract_group(text)
-            col1, col2 = st.columns([4, 1])
-            with col1:
-                st.write(f"**{achievement_text}**")
-                st.caption(f"Added: {format_datetime(created_at)}")
-            with col2:
-                color = st.session_state.group_colors.get(
-                    selected_category, '#4CAF50')
-                st.markdown(render_flag(points, color), unsafe_allow_html=True)
+        color = st.session_state.group_colors.get(selected_category, '#4CAF50')
+        achievement_list(category_achievements, color, key="sum_up_list",
+                         caption_prefix="Added", show_delete=False)
 
         # Add summary input field below the achievements list
         summary_text = st.text_area("Write your summary")
@@ -489,20 +520,21 @@ def main_app():
                                  for item in summary_text.split('\n') if item.strip()]
 
                 if summary_items:
-                    # Delete old achievements in the category for selected date range
-                    handlers.delete_achievements_by_category(
-                        selected_category, st.session_state.user_id, start_date, end_date)
-
                     # Distribute points evenly among new items
                     points_per_item = total_points // len(summary_items)
                     remaining_points = total_points % len(summary_items)
 
-                    # Add new achievements with today's date
-                    for i, item in summary_items:
-                        item_points = points_per_item + \
-                            (remaining_points if i == 0 else 0)
-                        handlers.add_achievement(
-                            f"{selected_category}: {item}", item_points, st.session_state.user_id)
+                    # Replace old achievements in the category for selected date range
+                    # with the new ones (dated today) in a single transaction
+                    new_items = [
+                        (f"{selected_category}: {item}",
+                         points_per_item + (remaining_points if i == 0 else 0))
+                        for i, item in enumerate(summary_items)
+                    ]
+                    handlers.replace_category_range(
+                        st.session_state.user_id, selected_category,
+                        start_date, end_date, new_items)
+                    invalidate_snapshot()
 
                     st.success("Summary added successfully!")
                     st.rerun()
@@ -510,7 +542,162 @@ def main_app():
         st.info("No achievements found in selected date range!")
 
 
-# Main flow
+@st.fragment
+def analytics_section():
+    st.subheader("Аналитика")
+    today = local_today()
+    snapshot = get_snapshot()
+    categories = sorted({achievement.group for achievement in snapshot.achievements})
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("С даты", value=today - timedelta(days=365),
+                                   key="analytics_start_date")
+    with col2:
+        end_date = st.date_input("По дату", value=today, key="analytics_end_date")
+    with col3:
+        category = st.selectbox("Категория", [None] + categories,
+                                format_func=lambda value: "Все" if value is None else value,
+                                key="analytics_category")
+
+    # Both charts read the rollup tables only, never the raw achievements
+    daily = handlers.get_rollups(st.session_state.user_id, "day", start_date, end_date, category)
+    if not daily:
+        st.info("Нет достижений за выбранный период")
+        return
+    weekly = handlers.get_rollups(st.session_state.user_id, "week", start_date, end_date, category)
+
+    st.altair_chart(heatmap_chart(daily), use_container_width=True)
+    st.altair_chart(trend_chart(weekly, st.session_state.group_colors),
+                    use_container_width=True)
+
+
+TRANSFER_KINDS = {"achievements": "Достижения", "group_colors": "Цвета групп"}
+
+
+@st.fragment
+def transfer_section():
+    with st.expander("Импорт и экспорт"):
+        col1, col2 = st.columns(2)
+        with col1:
+            kind = st.selectbox("Данные", list(TRANSFER_KINDS), format_func=TRANSFER_KINDS.get,
+                                key="transfer_kind")
+        with col2:
+            fmt = st.radio("Формат", bulk.FORMATS, horizontal=True, key="transfer_format")
+
+        # Export only on request: the file holds the user's whole history
+        if st.button("📦 Подготовить экспорт"):
+            out = io.StringIO()
+            bulk.export_rows(kind, out, fmt, st.session_state.user_id)
+            st.download_button("⬇️ Скачать", out.getvalue(), file_name=f"{kind}.{fmt}",
+                               mime="text/csv" if fmt == "csv" else "application/x-ndjson")
+
+        uploaded = st.file_uploader("Файл для импорта", type=["csv", "jsonl"],
+                                    key="transfer_file")
+        replace = kind == "achievements" and st.checkbox(
+            "Заменить мои достижения содержимым файла", key="transfer_replace")
+        if uploaded is not None and st.button("⬆️ Импортировать"):
+            source = io.TextIOWrapper(uploaded, encoding="utf-8", newline="")
+            try:
+                written = bulk.import_rows(kind, source, bulk.format_for(uploaded.name),
+                                           st.session_state.user_id, replace)
+            except bulk.BulkImportError as e:
+                st.error(str(e))
+                return
+            if kind == "group_colors":
+                st.session_state.group_colors.update(
+                    handlers.get_group_colors(st.session_state.user_id))
+                invalidate_bootstrap(st.session_state.user_id)
+            invalidate_snapshot()
+            st.toast(f"Импортировано строк: {written}")
+            st.rerun()
+
+
+LEADERBOARD_PERIODS = {"all": "Всё время", "week": "Неделя", "month": "Месяц"}
+LEADERBOARD_PAGE_SIZE = 10
+
+
+def set_leaderboard_page(page):
+    st.session_state.leaderboard_page = max(page, 0)
+
+
+@st.fragment
+def leaderboard_section():
+    st.subheader("Рейтинг")
+    snapshot = get_snapshot()
+    categories = sorted({achievement.group for achievement in snapshot.achievements})
+
+    col1, col2 = st.columns(2)
+    with col1:
+        period = st.radio("Период", list(LEADERBOARD_PERIODS),
+                          format_func=LEADERBOARD_PERIODS.get, horizontal=True,
+                          key="leaderboard_period", on_change=set_leaderboard_page, args=(0,))
+    with col2:
+        category = st.selectbox("Категория", [None] + categories,
+                                format_func=lambda value: "Все" if value is None else value,
+                                key="leaderboard_category",
+                                on_change=set_leaderboard_page, args=(0,))
+
+    page = st.session_state.get("leaderboard_page", 0)
+    rows = handlers.get_leaderboard(period, category, limit=LEADERBOARD_PAGE_SIZE,
+                                    offset=page * LEADERBOARD_PAGE_SIZE)
+    if rows:
+        st.table([{"Место": rank, "Пользователь": username, "Очки": points}
+                  for rank, _, username, points in rows])
+    else:
+        st.info("Пока никто не набрал очков за этот период")
+
+    own = handlers.get_user_rank(st.session_state.user_id, period, category)
+    if own is not None:
+        st.write(f"Ваше место: {own['rank']} из {own['total']} ({own['points']} очков)")
+
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        st.button("◀ Выше", key="leaderboard_prev", disabled=page == 0,
+                  on_click=set_leaderboard_page, args=(page - 1,))
+    with next_col:
+        st.button("Ниже ▶", key="leaderboard_next",
+                  disabled=len(rows) < LEADERBOARD_PAGE_SIZE,
+                  on_click=set_leaderboard_page, args=(page + 1,))
+
+
+def main_app():
+    st.title("Трекер достижений")
+    quote_section()
+    level_section()
+
+    if st.button("Выйти"):
+        revoke_sessions(st.session_state.user_id)
+        st.session_state.user_id = None
+        invalidate_snapshot()
+        st.query_params.pop("session", None)
+        st.rerun()
+
+    entry_form_section()
+    color_management_section()
+
+    # Show animation if needed
+    if st.session_state.show_animation is not None:
+        show_achievement_animation(st.session_state.show_animation)
+        st.session_state.show_animation = None
+
+    delete_all_section()
+    transfer_section()
+    report_section()
+    group_list_section()
+    search_section()
+    daily_journey_section()
+    daily_report_section()
+    sum_up_section()
+    analytics_section()
+    leaderboard_section()
+
+
+# Main flow: drop the snapshot on every full run; fragment reruns skip this
+# and keep reading the snapshot loaded below.
+invalidate_snapshot()
+if st.session_state.user_id is None:
+    resume_session()
 if st.session_state.user_id is None:
     login_form()
 else:
@@ -0,0 +1,23 @@
+from grouping import extract_group
+
+
+class Achievement:
+    """One achievement row with its group and text parsed once at fetch time."""
+    __slots__ = ("id", "description", "points", "created_at", "group", "text", "local_day")
+
+    def __init__(self, id, description, points, created_at, local_day=None):
+        self.id = id
+        self.description = description
+        self.points = points
+        self.created_at = created_at
+        self.group, self.text = extract_group(description)
+        self.local_day = local_day
+
+    @classmethod
+    def from_row(cls, row):
+        """Build from (id, description, points, created_at[, local_day])."""
+        return cls(*row)
+
+    def __repr__(self):
+        return (f"Achievement(id={self.id!r}, group={self.group!r}, "
+                f"points={self.points!r}, created_at={self.created_at!r})")
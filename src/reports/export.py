@@ -0,0 +1,117 @@
+# src/reports/export.py
+"""Nightly report export.
+
+Streams every user's achievements with a single ordered query, renders
+the per-user reports in a process pool and writes one file per user,
+atomically and optionally gzip-compressed.
+
+Usage (with src/ on PYTHONPATH):
+    python -m reports.export [--out DIR] [--gzip] [--workers N]
+"""
+import argparse
+import gzip
+import itertools
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import database.handlers as handlers
+from consts import REPORTS_DIR
+from reports.text import iter_report_chunks, report_title
+from view.utils import format_date, local_today
+
+FETCH_BATCH_SIZE = 5000
+
+
+def iter_user_achievements(batch_size=FETCH_BATCH_SIZE):
+    """Yield (user_id, username, rows) for every user from one streaming query."""
+    with handlers.get_read_connection() as conn:
+        # A named cursor keeps the result set on the server and fetches it
+        # in batches, so memory stays bounded by the largest single user.
+        with conn.cursor(name="report_export") as cur:
+            cur.itersize = batch_size
+            cur.execute("""
+                SELECT u.id, u.username, a.category, a.description
+                FROM users u
+                LEFT JOIN achievements a ON a.user_id = u.id
+                ORDER BY u.id, a.category COLLATE "C", a.created_at
+            """)
+            for (user_id, username), rows in itertools.groupby(cur, key=lambda row: row[:2]):
+                yield user_id, username, [row[2:] for row in rows if row[2] is not None]
+
+
+def write_atomic(path, chunks, compress=False):
+    """Write text chunks to path via a temporary file so readers never see partial output."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp creates owner-only files
+        with os.fdopen(fd, 'wb') as raw:
+            if compress:
+                with gzip.GzipFile(filename=path.name, mode='wb', fileobj=raw) as gz:
+                    for chunk in chunks:
+                        gz.write(chunk.encode('utf-8'))
+            else:
+                for chunk in chunks:
+                    raw.write(chunk.encode('utf-8'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return path
+
+
+def render_user_report(user_id, username, rows, out_dir, report_date, compress):
+    """Render and write a single user's report; runs in a worker process."""
+    chunks = itertools.chain(
+        [f"=== Report for {username} - {format_date(report_date)} ===\n"],
+        iter_report_chunks(rows, report_title()),
+    )
+    suffix = ".txt.gz" if compress else ".txt"
+    return str(write_atomic(Path(out_dir) / f"user_{user_id}{suffix}", chunks, compress))
+
+
+def export_reports(out_dir=REPORTS_DIR, compress=False, workers=None, report_date=None):
+    """Export every user's report into out_dir/<date>/ and return the written paths."""
+    report_date = report_date or local_today()
+    target_dir = Path(out_dir) / report_date.isoformat()
+    target_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    written = []
+    # Spawned workers do not inherit the parent's pooled DB connections.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = set()
+        for user_id, username, rows in iter_user_achievements():
+            pending.add(executor.submit(
+                render_user_report, user_id, username, rows, target_dir, report_date, compress))
+            # Bound the number of rendered-but-unwritten reports held in memory.
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written.extend(future.result() for future in done)
+        for future in pending:
+            written.append(future.result())
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reports.export")
+    parser.add_argument("--out", default=REPORTS_DIR,
+                        help=f"Output directory (default: {REPORTS_DIR})")
+    parser.add_argument("--gzip", action="store_true", help="Compress reports with gzip")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of render processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    written = export_reports(args.out, compress=args.gzip, workers=args.workers)
+    print(f"Exported {len(written)} report(s) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
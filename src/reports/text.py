@@ -0,0 +1,54 @@
+# src/reports/text.py
+"""Text report engine.
+
+Reports are produced as a stream of chunks from rows that SQL has already
+filtered by date and ordered by group, so callers can join them for
+`st.code`, pass them to a download button or write them to a file
+without holding a whole history in memory twice.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+import database.handlers as handlers
+from grouping import extract_group
+from view.utils import format_date
+
+# Achievement lines per yielded chunk
+CHUNK_LINES = 500
+
+
+def report_title(start_date=None):
+    if start_date:
+        return f"Мои достижения с {format_date(start_date)}:\n\n"
+    return "Мои достижения:\n\n"
+
+
+def iter_report_chunks(rows, title, skip_empty=False):
+    """Yield report text for (category, description) rows ordered by category.
+
+    With skip_empty, nothing (not even the title) is yielded for no rows.
+    """
+    started = False
+    for category, group_rows in groupby(rows, key=itemgetter(0)):
+        if not started:
+            yield title
+            started = True
+        parts = [f"- {category}:\n"]
+        for _, description in group_rows:
+            parts.append(f"  - {extract_group(description)[1]}\n")
+            if len(parts) >= CHUNK_LINES:
+                yield "".join(parts)
+                parts = []
+        parts.append("\n")
+        yield "".join(parts)
+    if not started and not skip_empty:
+        yield title
+
+
+def iter_user_report(user_id, start_date=None, end_date=None, title=None,
+                     skip_empty=False, tz=None):
+    """Stream a user's grouped report for an optional local date range."""
+    if title is None:
+        title = report_title(start_date)
+    rows = handlers.iter_report_rows(user_id, start_date, end_date, tz)
+    yield from iter_report_chunks(rows, title, skip_empty)
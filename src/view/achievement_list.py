@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from view.utils import format_datetime
+
+ROW_HEIGHT = 100  # Fits the tallest flag (40 + 50 points) plus margins
+MAX_LIST_HEIGHT = 600
+
+_achievement_list = components.declare_component(
+    "achievement_list",
+    path=str(Path(__file__).parent / "components" / "achievement_list"),
+)
+
+
+def achievement_list(achievements, color, key, caption_prefix="Добавлено",
+                     show_delete=True, max_height=MAX_LIST_HEIGHT):
+    """Render achievements as one windowed HTML list; return the id to delete, if any.
+
+    The whole group is sent as a single component instead of a set of
+    Streamlit elements per row, and the browser only materializes the rows
+    scrolled into view.
+    """
+    rows = [
+        {
+            "id": achievement.id,
+            "text": achievement.text,
+            "caption": f"{caption_prefix}: {format_datetime(achievement.created_at)}",
+            "points": achievement.points,
+        }
+        for achievement in achievements
+    ]
+    event = _achievement_list(
+        rows=rows,
+        color=color,
+        show_delete=show_delete,
+        row_height=ROW_HEIGHT,
+        max_height=max_height,
+        key=key,
+        default=None,
+    )
+
+    # Component values persist across reruns; act on each click only once.
+    nonce_key = f"{key}_handled_nonce"
+    if event and event.get("action") == "delete" and event.get("nonce") != st.session_state.get(nonce_key):
+        st.session_state[nonce_key] = event["nonce"]
+        return event["id"]
+    return None
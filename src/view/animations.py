@@ -1,11 +1,16 @@
 import random
-from streamlit_extras.let_it_rain import rain
 import streamlit as st
 import time
 
 from view.style_and_content_consts import MOTIVATION_MESSAGES
 
 
+def rain(**kwargs):
+    # streamlit_extras is slow to import and only needed once an animation plays
+    from streamlit_extras.let_it_rain import rain as let_it_rain
+    let_it_rain(**kwargs)
+
+
 def show_level_up_animation(new_level):
     with st.empty():
         st.markdown(
@@ -0,0 +1,53 @@
+from collections import defaultdict
+from datetime import timedelta
+
+WEEKDAYS_SHORT_RU = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+
+def heatmap_chart(daily_rows):
+    """Calendar heatmap (weeks × weekdays) from (day, category, points, count) rollups."""
+    # altair is only needed once the analytics section is drawn
+    import altair as alt
+
+    totals = defaultdict(lambda: [0, 0])
+    for day, _, points, count in daily_rows:
+        totals[day][0] += points
+        totals[day][1] += count
+    values = [{
+        "week": (day - timedelta(days=day.weekday())).isoformat(),
+        "weekday": WEEKDAYS_SHORT_RU[day.weekday()],
+        "day": day.isoformat(),
+        "points": points,
+        "count": count,
+    } for day, (points, count) in sorted(totals.items())]
+
+    return alt.Chart(alt.Data(values=values)).mark_rect(cornerRadius=2).encode(
+        x=alt.X("week:T", title=None, axis=alt.Axis(format="%b %Y")),
+        y=alt.Y("weekday:O", title=None, sort=WEEKDAYS_SHORT_RU),
+        color=alt.Color("points:Q", title="Очки", scale=alt.Scale(scheme="greens")),
+        tooltip=[alt.Tooltip("day:T", title="День"),
+                 alt.Tooltip("points:Q", title="Очки"),
+                 alt.Tooltip("count:Q", title="Достижений")],
+    ).properties(height=180)
+
+
+def trend_chart(weekly_rows, colors=None):
+    """Weekly points per category, stacked, from (week, category, points, count) rollups."""
+    import altair as alt
+
+    values = [{"week": week.isoformat(), "category": category, "points": points}
+              for week, category, points, _ in weekly_rows]
+    color = alt.Color("category:N", title="Категория")
+    if colors:
+        categories = sorted({row["category"] for row in values})
+        color = alt.Color("category:N", title="Категория", scale=alt.Scale(
+            domain=categories, range=[colors.get(name, "#4CAF50") for name in categories]))
+
+    return alt.Chart(alt.Data(values=values)).mark_area(opacity=0.8).encode(
+        x=alt.X("week:T", title="Неделя"),
+        y=alt.Y("sum(points):Q", title="Очки", stack=True),
+        color=color,
+        tooltip=[alt.Tooltip("week:T", title="Неделя"),
+                 alt.Tooltip("category:N", title="Категория"),
+                 alt.Tooltip("points:Q", title="Очки")],
+    ).properties(height=240)
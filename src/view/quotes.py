@@ -0,0 +1,87 @@
+import os
+import random
+import threading
+from array import array
+from pathlib import Path
+
+from consts import QUOTES_FILE
+
+QUOTES_PATH = Path("/app/data") / QUOTES_FILE  # Mounted data volume
+QUOTES_NOT_FOUND = "Файл с цитатами не найден"
+
+
+class QuoteIndex:
+    """Random access to the non-blank lines of a quotes file.
+
+    The file is indexed once into a table of line offsets, so picking a
+    quote reads a single line with pread() instead of the whole file. The
+    index is rebuilt when the file's mtime, size or inode change. Unlike a
+    memory mapping, pread() of a file truncated under us returns short
+    data instead of killing the process with SIGBUS.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._file = None
+        self._offsets = array('Q')
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _rebuild(self, stamp):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        offsets = array('Q')
+        if stamp is not None and stamp[1] > 0:
+            self._file = open(self.path, 'rb')
+            position = 0
+            for line in self._file:
+                if line.strip():
+                    offsets.append(position)
+                    offsets.append(position + len(line.rstrip(b'\n')))
+                position += len(line)
+        self._offsets = offsets
+        self._stamp = stamp
+
+    def refresh(self):
+        """Re-index the file if it changed since the last call."""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._rebuild(stamp)
+
+    def __len__(self):
+        return len(self._offsets) // 2
+
+    def random_quote(self):
+        self.refresh()
+        with self._lock:
+            count = len(self._offsets) // 2
+            if not count:
+                return QUOTES_NOT_FOUND
+            i = random.randrange(count)
+            start, end = self._offsets[2 * i], self._offsets[2 * i + 1]
+            data = os.pread(self._file.fileno(), end - start, start)
+            return data.decode('utf-8', errors='replace').strip()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_quote_index():
+    """Return the process-wide quote index, creating it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = QuoteIndex(QUOTES_PATH)
+    return _index
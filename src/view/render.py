@@ -1,5 +1,10 @@
+import hashlib
 import json
+import math
 import random
+import threading
+from collections import OrderedDict
+from html import escape
 import streamlit as st
 
 
@@ -53,135 +58,100 @@ def render_level_progress(level_info):
     """
 
 
+CIRCLE_BASE_SIZE = 30
+CIRCLE_MAX_SIZE = 60
+MIN_SPACING = 120
+CENTER_X = 600
+CHARS_PER_LINE = 50  # Approximate characters per line
+LINE_HEIGHT = 20
+JOURNEY_PADDING = 20
+IFRAME_BODY_MARGIN = 8
+JOURNEY_CACHE_SIZE = 256
+
+_journey_cache = OrderedDict()
+_journey_cache_lock = threading.Lock()
+
+
+def wrap_text(text, chars_per_line=CHARS_PER_LINE):
+    """Greedy word wrap by character count."""
+    words = text.split(' ')
+    lines = []
+    current_line = words[0]
+    for word in words[1:]:
+        if len(current_line) + len(word) + 1 <= chars_per_line:
+            current_line += " " + word
+        else:
+            lines.append(current_line)
+            current_line = word
+    lines.append(current_line)
+    return lines
+
+
+def render_daily_journey_svg(achievements):
+    """Lay out the journey as a static SVG; returns (svg, svg_height)."""
+    items = []
+    for index, achievement in enumerate(achievements):
+        radius = CIRCLE_BASE_SIZE + (achievement['points'] / 50) * (CIRCLE_MAX_SIZE - CIRCLE_BASE_SIZE)
+        y = index * MIN_SPACING + radius + 40
+        items.append((achievement, radius, y))
+
+    height = items[-1][2] + CIRCLE_MAX_SIZE if items else 200
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="100%" height="{height:g}" '
+        f'style="max-width: 800px;">',
+        f'<line x1="{CENTER_X}" y1="20" x2="{CENTER_X}" y2="{height - 20:g}" '
+        f'stroke="#e2e8f0" stroke-width="2" stroke-dasharray="6,6"/>',
+    ]
+    for achievement, radius, y in items:
+        text_x = CENTER_X - radius - 20
+        lines = wrap_text(achievement['description'])
+        parts.append('<g>')
+        for index, line in enumerate(lines):
+            line_y = y - (len(lines) - 1) * LINE_HEIGHT / 2 + index * LINE_HEIGHT
+            parts.append(
+                f'<text x="{text_x:g}" y="{line_y:g}" text-anchor="end" '
+                f'style="font-size: 16px; fill: #1e293b;">{escape(line)}</text>')
+        parts.append(
+            f'<text x="{text_x:g}" y="{y + len(lines) * 10 + 10:g}" text-anchor="end" '
+            f'style="font-size: 14px; fill: #64748b;">{escape(achievement["created_at"])}</text>')
+        parts.append(
+            f'<circle cx="{CENTER_X}" cy="{y:g}" r="{radius:g}" '
+            f'fill="{escape(achievement["color"])}" fill-opacity="0.9"/>')
+        parts.append(
+            f'<text x="{CENTER_X}" y="{y:g}" text-anchor="middle" dominant-baseline="middle" '
+            f'style="fill: white; font-size: 16px; font-weight: bold;">{achievement["points"]}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return "".join(parts), height
+
+
 def create_daily_journey_html(achievements):
-    """Create an HTML string for the daily journey visualization."""
+    """Render the daily journey as static HTML; returns (html, exact_height).
+
+    Results are cached by a content hash of the day's achievements and
+    colors, so re-opening an unchanged journey skips the layout entirely.
+    """
     # Sort achievements by created_at in ascending order (oldest first)
     sorted_achievements = sorted(achievements, key=lambda x: x['created_at'])
-    
-    html = """
-            <div id="daily-journey" style="font-family: sans-serif; padding: 20px;">
-                <script>
-                    const achievements = ACHIEVEMENTS_PLACEHOLDER;
-
-                    function createJourney() {
-                        const container = document.getElementById('daily-journey');
-                        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
-
-                        const CIRCLE_BASE_SIZE = 30;
-                        const CIRCLE_MAX_SIZE = 60;
-                        const MIN_SPACING = 120;
-                        const CENTER_X = 600;
-                        const TEXT_WIDTH = 400; // Maximum width for text
-                        const CHARS_PER_LINE = 50; // Approximate characters per line
-
-                        // Calculate positions and sizes
-                        const journeyItems = achievements.map((achievement, index) => {
-                            const radius = CIRCLE_BASE_SIZE + (achievement.points / 50) * (CIRCLE_MAX_SIZE - CIRCLE_BASE_SIZE);
-                            const y = index * MIN_SPACING + radius + 40;
-                            return { ...achievement, y, radius };
-                        });
-
-                        const height = journeyItems.length > 0
-                            ? journeyItems[journeyItems.length - 1].y + CIRCLE_MAX_SIZE
-                            : 200;
-
-                        // Set SVG attributes
-                        svg.setAttribute('width', '100%');
-                        svg.setAttribute('height', height);
-                        svg.style.maxWidth = '800px';
-
-                        // Create dotted line
-                        const line = document.createElementNS('http://www.w3.org/2000/svg', 'line');
-                        line.setAttribute('x1', CENTER_X);
-                        line.setAttribute('y1', '20');
-                        line.setAttribute('x2', CENTER_X);
-                        line.setAttribute('y2', height - 20);
-                        line.setAttribute('stroke', '#e2e8f0');
-                        line.setAttribute('stroke-width', '2');
-                        line.setAttribute('stroke-dasharray', '6,6');
-                        svg.appendChild(line);
-
-                        // Function to wrap text
-                        function wrapText(text, width) {
-                            const words = text.split(' ');
-                            let lines = [];
-                            let currentLine = words[0];
-
-                            for (let i = 1; i < words.length; i++) {
-                                if (currentLine.length + words[i].length + 1 <= CHARS_PER_LINE) {
-                                    currentLine += " " + words[i];
-                                } else {
-                                    lines.push(currentLine);
-                                    currentLine = words[i];
-                                }
-                            }
-                            lines.push(currentLine);
-                            return lines;
-                        }
-
-                        // Create journey items
-                        journeyItems.forEach(item => {
-                            // Create group for each item
-                            const g = document.createElementNS('http://www.w3.org/2000/svg', 'g');
-
-                            // Wrap and add text lines
-                            const lines = wrapText(item.description, TEXT_WIDTH);
-                            lines.forEach((line, index) => {
-                                const text = document.createElementNS('http://www.w3.org/2000/svg', 'text');
-                                text.setAttribute('x', CENTER_X - item.radius - 20);
-                                text.setAttribute('y', item.y - (lines.length - 1) * 20 / 2 + index * 20);
-                                text.setAttribute('text-anchor', 'end');
-                                text.style.fontSize = '16px';
-                                text.style.fill = '#1e293b';
-                                text.textContent = line;
-                                g.appendChild(text);
-                            });
-
-                            // Add time
-                            const time = document.createElementNS('http://www.w3.org/2000/svg', 'text');
-                            time.setAttribute('x', CENTER_X - item.radius - 20);
-                            time.setAttribute('y', item.y + lines.length * 10 + 10);
-                            time.setAttribute('text-anchor', 'end');
-                            time.style.fontSize = '14px';
-                            time.style.fill = '#64748b';
-                            time.textContent = item.created_at;  // Use the string directly
-                            g.appendChild(time);
-
-                            // Add circle
-                            const circle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
-                            circle.setAttribute('cx', CENTER_X);
-                            circle.setAttribute('cy', item.y);
-                            circle.setAttribute('r', item.radius);
-                            circle.setAttribute('fill', item.color);  // Use the color from achievement data
-                            circle.setAttribute('fill-opacity', '0.9');
-                            g.appendChild(circle);
-
-                            // Add points
-                            const points = document.createElementNS('http://www.w3.org/2000/svg', 'text');
-                            points.setAttribute('x', CENTER_X);
-                            points.setAttribute('y', item.y);
-                            points.setAttribute('text-anchor', 'middle');
-                            points.setAttribute('dominant-baseline', 'middle');
-                            points.style.fill = 'white';
-                            points.style.fontSize = '16px';
-                            points.style.fontWeight = 'bold';
-                            points.textContent = item.points;
-                            g.appendChild(points);
-
-                            svg.appendChild(g);
-                        });
-
-                        container.appendChild(svg);
-                    }
-
-                    // Create visualization when the page loads
-                    window.onload = createJourney;
-                </script>
-            </div>
-            """
-
-    # Insert the sorted achievements data
-    achievements_json = json.dumps(sorted_achievements)
-    html = html.replace('ACHIEVEMENTS_PLACEHOLDER', achievements_json)
-
-    return html
+    key = hashlib.sha256(
+        json.dumps(sorted_achievements, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+    with _journey_cache_lock:
+        cached = _journey_cache.get(key)
+        if cached is not None:
+            _journey_cache.move_to_end(key)
+            return cached
+
+    svg, svg_height = render_daily_journey_svg(sorted_achievements)
+    html = (f'<div id="daily-journey" style="font-family: sans-serif; '
+            f'padding: {JOURNEY_PADDING}px;">{svg}</div>')
+    height = math.ceil(svg_height) + 2 * JOURNEY_PADDING + 2 * IFRAME_BODY_MARGIN
+    result = (html, height)
+
+    with _journey_cache_lock:
+        _journey_cache[key] = result
+        while len(_journey_cache) > JOURNEY_CACHE_SIZE:
+            _journey_cache.popitem(last=False)
+    return result
@@ -1,36 +1,24 @@
-from datetime import timedelta
-from pathlib import Path
-import random
-import streamlit as st
-from consts import QUOTES_FILE
-
-
-def load_quotes():
-    """Load quotes from the quotes.txt file"""
-    quotes_path = Path(
-        "/app/data") / QUOTES_FILE  # Updated path to mounted volume
-    try:
-        with open(quotes_path, 'r', encoding='utf-8') as file:
-            return [line.strip() for line in file if line.strip() if line.strip()]
-    except FileNotFoundError:
-        return ["Файл с цитатами не найден"]
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from consts import APP_TIMEZONE, DB_TIMEZONE
+from grouping import extract_group
+from view.quotes import get_quote_index
 
 
 def get_random_quote():
-    """Get a random quote from the loaded quotes"""
-    quotes = load_quotes()
-    return random.choice(quotes)
+    """Get a random quote from the process-wide quote index"""
+    return get_quote_index().random_quote()
 
 
-# Moscow time instead of UTC
+# DB timestamps are naive DB_TIMEZONE values; show them in APP_TIMEZONE
 def adjust_time(timestamp):
-    return timestamp + timedelta(hours=3)
+    return timestamp.replace(tzinfo=ZoneInfo(DB_TIMEZONE)).astimezone(
+        ZoneInfo(APP_TIMEZONE)).replace(tzinfo=None)
 
 
-def extract_group(description):
-    if ":" in description and description.split(":")[0].strip().isupper():
-        return description.split(":")[0].strip(), description.split(":", 1)[1].strip()
-    return "ДРУГОЕ", description
+def local_today():
+    """Today's date in APP_TIMEZONE, regardless of the server clock."""
+    return datetime.now(ZoneInfo(APP_TIMEZONE)).date()
 
 
 WEEKDAYS_RU = {